@@ -1,74 +1,111 @@
 import logging
 from homeassistant import core
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_registry import RegistryEntry, async_migrate_entries
-from .const import *
-from .utils import get_option
+from .const import DOMAIN, CONFIG_VERSION, LEGACY_MAPPING, SETUP_BUDGET_MS, TRANSITION_REFRESH
 from .api_client import OhmeApiClient
-from .coordinator import OhmeChargeSessionsCoordinator, OhmeAccountInfoCoordinator, OhmeAdvancedSettingsCoordinator, OhmeChargeSchedulesCoordinator
+from .archive import SessionArchive, archive_path
+from .services import async_setup_services
+from .coordinator import OhmeChargeSessionsCoordinator, OhmeAccountInfoCoordinator, OhmeAdvancedSettingsCoordinator, OhmeChargeSchedulesCoordinator, OhmeRuntimeData
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.issue_registry import async_create_issue
+from .utils import PhaseTimer
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup(hass: core.HomeAssistant, config: dict) -> bool:
     """Set up the Ohme EV Charger component."""
+    await async_setup_services(hass)
     return True
 
 
-async def async_setup_dependencies(hass, entry):
+async def async_setup_dependencies(hass, entry, timer=None):
     """Instantiate client and refresh session"""
-    client = OhmeApiClient(entry.data['email'], entry.data['password'])
-    account_id = entry.data['email']
-
-    hass.data[DOMAIN][account_id][DATA_CLIENT] = client
+    timer = timer or PhaseTimer()
+
+    def _store_token(token):
+        """Persist refreshed tokens so the next start can skip the password login."""
+        hass.config_entries.async_update_entry(entry, data={**entry.data, "token": token})
+
+    client = OhmeApiClient(
+        entry.data['email'],
+        entry.data['password'],
+        token=entry.data.get('token'),
+        token_callback=_store_token,
+        hedge_requests=entry.options.get("hedge_requests", False)
+    )
 
-    hass.data[DOMAIN][account_id][DATA_OPTIONS] = entry.options
+    # Only logs in with the password if there's no stored token or it's been revoked
+    try:
+        with timer.phase("login"):
+            await client.async_refresh_session()
+        with timer.phase("device_info"):
+            await client.async_update_device_info()
+    except BaseException:
+        # Setup is retried with a new client, so don't leave this one's sessions open
+        await client.async_close()
+        raise
 
-    await client.async_create_session()
-    await client.async_update_device_info()
+    return client
 
 
 async def async_update_listener(hass, entry):
-    """Handle options flow credentials update."""
-    
-    # Reload this instance
-    await hass.config_entries.async_reload(entry.entry_id)
+    """Apply config entry changes. Only a credential change needs a reload, anything
+       else is applied to the running coordinators and entities."""
+    if entry.state is not ConfigEntryState.LOADED:
+        return
 
+    runtime = entry.runtime_data
 
-async def async_setup_entry(hass, entry):
-    """This is called from the config flow."""
-    
-    def _update_unique_id(entry: RegistryEntry) -> dict[str, str] | None:
-        """Update unique IDs from old format."""
-        if entry.unique_id.startswith("ohme_"):
-            parts = entry.unique_id.split('_')
-            legacy_id = '_'.join(parts[2:])
-
-            if legacy_id in LEGACY_MAPPING:
-                new_id = LEGACY_MAPPING[legacy_id]
-            else:
-                new_id = legacy_id
+    # Credentials changed
+    if not runtime.client.uses_credentials(entry.data['email'], entry.data['password']):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
 
-            new_id = f"{parts[1]}_{new_id}"
+    # Stored tokens are also saved to the entry, so there may be nothing to do
+    if dict(entry.options) == dict(runtime.options):
+        return
 
-            return {"new_unique_id": new_id}
-        return None
+    runtime.options = entry.options
+    runtime.client.hedge_requests = entry.options.get("hedge_requests", False)
 
-    await async_migrate_entries(hass, entry.entry_id, _update_unique_id)
+    for coordinator in runtime.coordinators():
+        coordinator.apply_options(entry.options)
 
-    account_id = entry.data['email']
+    # Slot views depend on never_collapse_slots, and the inputs on never_session_specific,
+    # so recalculate entity states from the data we already have. Every entity using an
+    # option listens to charge sessions, and some also listen to schedules, so only
+    # charge sessions is updated to recalculate each of them once
+    runtime.slot_cache.invalidate()
+    runtime.charge_sessions.async_update_listeners()
 
-    hass.data.setdefault(DOMAIN, {})    
-    hass.data[DOMAIN].setdefault(account_id, {})
 
-    await async_setup_dependencies(hass, entry)
+async def async_setup_entry(hass, entry):
+    """This is called from the config flow."""
+    timer = PhaseTimer()
+    client = await async_setup_dependencies(hass, entry, timer)
+
+    # Enabling a disabled entity reloads the entry, so this is checked again when it would matter
+    disabled = {
+        registry_entry.unique_id
+        for registry_entry in er.async_entries_for_config_entry(er.async_get(hass), entry.entry_id)
+        if registry_entry.disabled
+    }
+
+    runtime = OhmeRuntimeData(
+        client=client,
+        charge_sessions=OhmeChargeSessionsCoordinator(hass, client, entry.options),
+        account_info=OhmeAccountInfoCoordinator(hass, client, entry.options) if client.needs_account_info(disabled) else None,
+        advanced_settings=OhmeAdvancedSettingsCoordinator(hass, client, entry.options),
+        charge_schedules=OhmeChargeSchedulesCoordinator(hass, client, entry.options),
+        options=entry.options,
+        platforms=client.platforms()
+    )
 
-    coordinators = [
-        OhmeChargeSessionsCoordinator(hass=hass, account_id=account_id),   # COORDINATOR_CHARGESESSIONS
-        OhmeAccountInfoCoordinator(hass=hass, account_id=account_id),      # COORDINATOR_ACCOUNTINFO
-        OhmeAdvancedSettingsCoordinator(hass=hass, account_id=account_id), # COORDINATOR_ADVANCED
-        OhmeChargeSchedulesCoordinator(hass=hass, account_id=account_id)   # COORDINATOR_SCHEDULES
-    ]
+    coordinators = runtime.coordinators()
 
     # We can function without these so setup can continue
     coordinators_optional = [
@@ -78,7 +115,8 @@ async def async_setup_entry(hass, entry):
     for coordinator in coordinators:
         # Catch failures if this is an 'optional' coordinator
         try:
-            await coordinator.async_config_entry_first_refresh()
+            with timer.phase(coordinator.__class__.__name__):
+                await coordinator.async_config_entry_first_refresh()
         except ConfigEntryNotReady as ex:
             allow_failure = False
             for optional in coordinators_optional:
@@ -87,12 +125,39 @@ async def async_setup_entry(hass, entry):
             if allow_failure:
                 _LOGGER.error(f"{coordinator.__class__.__name__} failed to setup. This coordinator is optional so the integration will still function, but please raise an issue if this persists.")
             else:
+                await client.async_close()
                 raise ex
+        except BaseException:
+            await client.async_close()
+            raise
+
+    entry.runtime_data = runtime
 
-    hass.data[DOMAIN][account_id][DATA_COORDINATORS] = coordinators
+    @callback
+    def _refresh_on_transition():
+        """Refresh only the coordinators a charge state transition affects."""
+        # Consume them, as listeners are also called when options change
+        transitions, runtime.charge_sessions.transitions = runtime.charge_sessions.transitions, set()
+
+        names = {name for transition in transitions for name in TRANSITION_REFRESH[transition]}
+        for name in names:
+            coordinator = getattr(runtime, name)
+            if coordinator is not None:
+                _LOGGER.debug("Refreshing %s after %s", coordinator.name, ", ".join(transitions))
+                hass.async_create_task(coordinator.async_request_refresh())
+
+    entry.async_on_unload(runtime.charge_sessions.async_add_listener(_refresh_on_transition))
+    entry.async_on_unload(entry.add_update_listener(async_update_listener))
 
     # Setup entities
-    await hass.config_entries.async_forward_entry_setups(entry, ENTITY_TYPES)
+    with timer.phase("platforms"):
+        await hass.config_entries.async_forward_entry_setups(entry, runtime.platforms)
+
+    runtime.setup_timings = timer.timings
+    if timer.total > SETUP_BUDGET_MS:
+        _LOGGER.warning("Setup took %sms, over the %sms budget: %s", timer.total, SETUP_BUDGET_MS, timer)
+    else:
+        _LOGGER.debug("Setup took %sms: %s", timer.total, timer)
 
     # Add Core integration message
     async_create_issue(
@@ -112,7 +177,38 @@ async def async_setup_entry(hass, entry):
 async def async_unload_entry(hass, entry):
     """Unload a config entry."""
 
-    return await hass.config_entries.async_unload_platforms(entry, ENTITY_TYPES)
+    unloaded = await hass.config_entries.async_unload_platforms(entry, entry.runtime_data.platforms)
+    if unloaded:
+        await entry.runtime_data.client.async_close()
+
+    return unloaded
+
+
+async def async_remove_entry(hass, entry):
+    """Delete the session archives kept for the entry's chargers."""
+    device_registry = dr.async_get(hass)
+    for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+        for domain, identifier in device.identifiers:
+            if domain == DOMAIN and identifier.startswith("ohme_charger_"):
+                archive = SessionArchive(archive_path(hass, identifier[len("ohme_charger_"):]))
+                await hass.async_add_executor_job(archive.remove)
+
+
+def _update_unique_id(entry: RegistryEntry) -> dict[str, str] | None:
+    """Update unique IDs from old format."""
+    if entry.unique_id.startswith("ohme_"):
+        parts = entry.unique_id.split('_')
+        legacy_id = '_'.join(parts[2:])
+
+        if legacy_id in LEGACY_MAPPING:
+            new_id = LEGACY_MAPPING[legacy_id]
+        else:
+            new_id = legacy_id
+
+        new_id = f"{parts[1]}_{new_id}"
+
+        return {"new_unique_id": new_id}
+    return None
 
 
 async def async_migrate_entry(hass: core.HomeAssistant, config_entry) -> bool:
@@ -127,8 +223,14 @@ async def async_migrate_entry(hass: core.HomeAssistant, config_entry) -> bool:
         _LOGGER.debug("Migrating from version %s", config_entry.version)
         new_data = config_entry.data
 
-        config_entry.version = CONFIG_VERSION
-        hass.config_entries.async_update_entry(config_entry, data=new_data)
+        # Unique IDs changed format in version 2. This used to run on every start
+        if config_entry.version < 2:
+            timer = PhaseTimer()
+            with timer.phase("migration"):
+                await async_migrate_entries(hass, config_entry.entry_id, _update_unique_id)
+            _LOGGER.debug("Unique ID migration took %sms", timer.total)
+
+        hass.config_entries.async_update_entry(config_entry, data=new_data, version=CONFIG_VERSION)
 
         _LOGGER.debug("Migration to version %s successful", config_entry.version)
 
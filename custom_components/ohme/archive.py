@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import slugify
+from .const import DOMAIN
+from .session import graph_time_ms
+from .utils import now_ms
+
+_LOGGER = logging.getLogger(__name__)
+
+# Modes where there is no longer a session in progress
+ENDED_MODES = ("FINISHED_CHARGE", "DISCONNECTED")
+
+# How often to save the session in progress when only its end and energy have moved on
+TRACKER_SAVE_INTERVAL_MS = 300000
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS sessions ("
+    "start_ms INTEGER NOT NULL, end_ms INTEGER NOT NULL, energy_wh REAL NOT NULL, "
+    "slots TEXT NOT NULL, rule TEXT)",
+    "CREATE INDEX IF NOT EXISTS sessions_start ON sessions (start_ms)",
+    "CREATE TABLE IF NOT EXISTS tracker (id INTEGER PRIMARY KEY CHECK (id = 0), state TEXT NOT NULL)",
+)
+
+
+def archive_path(hass, serial):
+    """Where the session archive for a charger is kept."""
+    return hass.config.path(STORAGE_DIR, f"{DOMAIN}_sessions_{slugify(serial)}.db")
+
+
+def session_start(data):
+    """When the session began in epoch ms, if the payload says."""
+    if isinstance(data.get('startTime'), (int, float)):
+        return graph_time_ms(data['startTime'])
+
+    points = (data.get('chargeGraph') or {}).get('points')
+    if points:
+        return graph_time_ms(points[0]['x'])
+
+    return None
+
+
+class SessionTracker:
+    """Follow charge session payloads and emit a record when a session ends.
+       The record in progress is rebuilt from every payload and can be saved,
+       so a session that ends over a restart is still archived."""
+
+    def __init__(self):
+        self._record = None
+        # What was last saved, and when
+        self._saved_key = None
+        self._saved_at = 0
+
+    def update(self, data, now=None):
+        """Fold in a payload. Returns the completed session record, if one just ended."""
+        if not data:
+            return None
+
+        now = now_ms() if now is None else now
+
+        if data['mode'] not in ENDED_MODES:
+            # Nothing has happened until the charge is approved
+            if data['mode'] == "PENDING_APPROVAL" and self._record is None:
+                return None
+
+            ended = None
+            start = session_start(data)
+
+            # A saved session that finished while we weren't running
+            if self._record is not None and start is not None and start > self._record[1]:
+                ended, self._record = self._record, None
+
+            if self._record is not None:
+                start = self._record[0]
+            elif start is None:
+                start = now
+
+            self._record = session_record(data, start, now)
+            return ended
+
+        # No session was in progress, eg. FINISHED_CHARGE followed by DISCONNECTED
+        if self._record is None:
+            return None
+
+        # Prefer the final figures if the ended payload still has them. Otherwise the
+        # session ends when it was last seen, which may have been before a restart
+        if data['mode'] == "FINISHED_CHARGE":
+            record = session_record(data, self._record[0], now)
+        else:
+            record = self._record
+
+        self._record = None
+        return record
+
+    def _key(self):
+        """The record in progress without the fields that change on every payload."""
+        if self._record is None:
+            return None
+        return (self._record[0], self._record[3], self._record[4])
+
+    def save_due(self, now):
+        """Whether the context should be saved. Sessions opening or closing, or their start,
+           slots or rule changing are saved straight away, otherwise only every so often."""
+        key = self._key()
+        if key != self._saved_key:
+            return True
+        return key is not None and now - self._saved_at >= TRACKER_SAVE_INTERVAL_MS
+
+    def saved(self, now):
+        """Note that the context has been saved."""
+        self._saved_key = self._key()
+        self._saved_at = now
+
+    def as_dict(self):
+        """Context to save across restarts."""
+        return {"record": None if self._record is None else list(self._record)}
+
+    def restore(self, data):
+        """Restore saved context."""
+        record = data.get("record")
+        self._record = None if record is None else tuple(record)
+        self._saved_key = self._key()
+
+
+def session_record(data, start, end):
+    """Compact archive row for a session."""
+    energy = 0
+    try:
+        energy = data['chargeGraph']['now']['y'] or 0
+    except (KeyError, TypeError):
+        if data.get('batterySoc') and data['batterySoc'].get('wh'):
+            energy = data['batterySoc']['wh']
+
+    slots = [
+        [slot['startTimeMs'], slot['endTimeMs'], slot['estimatedSoc']['wh']]
+        for slot in data.get('allSessionSlots') or []
+    ]
+
+    return (
+        start,
+        end,
+        energy,
+        json.dumps(slots, separators=(",", ":")),
+        json.dumps(data.get('appliedRule'), separators=(",", ":")) if data.get('appliedRule') else None
+    )
+
+
+class SessionArchive:
+    """Append-only SQLite archive of completed charge sessions, indexed on start time.
+       Methods block, so should be run in the executor."""
+
+    def __init__(self, path):
+        self._path = path
+        self._ready = False
+
+    def _connect(self):
+        # Only needed once a session has ended or been queried, so keep it off the import path
+        import sqlite3
+
+        conn = sqlite3.connect(self._path)
+        if not self._ready:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            self._ready = True
+        return conn
+
+    def append(self, record):
+        """Write a completed session."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT INTO sessions VALUES (?, ?, ?, ?, ?)", record)
+        finally:
+            conn.close()
+
+    def save_tracker(self, state):
+        """Save the session tracker context."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO tracker VALUES (0, ?)", (json.dumps(state),))
+        finally:
+            conn.close()
+
+    def load_tracker(self):
+        """Saved session tracker context, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT state FROM tracker WHERE id = 0").fetchone()
+        finally:
+            conn.close()
+
+        return json.loads(row[0]) if row else None
+
+    def remove(self):
+        """Delete the archive."""
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+        self._ready = False
+
+    def aggregate(self, start_ms, end_ms):
+        """Aggregate sessions starting within the range start_ms to end_ms."""
+        conn = self._connect()
+        try:
+            count, energy, duration, first, last = conn.execute(
+                "SELECT COUNT(*), TOTAL(energy_wh), TOTAL(end_ms - start_ms), MIN(start_ms), MAX(end_ms) "
+                "FROM sessions WHERE start_ms >= ? AND start_ms < ?",
+                (start_ms, end_ms)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        return {
+            "sessions": count,
+            "energy_wh": energy,
+            "average_energy_wh": energy / count if count else None,
+            "plugged_in_duration_s": int(duration) // 1000,
+            "first_start_ms": first,
+            "last_end_ms": last
+        }
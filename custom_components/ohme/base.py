@@ -26,11 +26,25 @@ class OhmeEntity(Entity):
                 self._handle_coordinator_update, None
             )
         )
-    
+
+        # Restore anything saved before a restart, then bring it up to date from the data we already have.
+        # State is only calculated on coordinator updates, so would otherwise be empty until the next one
+        await self._async_restore_state()
+        if self.coordinator.data is not None:
+            self._handle_coordinator_update()
+
     @callback
     def _handle_coordinator_update(self) -> None:
         self.async_write_ha_state()
 
+    async def _async_restore_state(self) -> None:
+        """Restore state saved before a restart. Only entities that are a RestoreEntity do anything here."""
+
+    @property
+    def _options(self):
+        """Options of the config entry this entity belongs to."""
+        return self.coordinator.config_entry.runtime_data.options
+
     @property
     def unique_id(self):
         """Return unique ID of the entity."""
@@ -5,12 +5,11 @@ from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
     BinarySensorEntity
 )
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.entity import generate_entity_id
+from homeassistant.helpers.restore_state import RestoreEntity, RestoredExtraData
 from homeassistant.util.dt import (utcnow)
-from .const import DOMAIN, DATA_COORDINATORS, DATA_SLOTS, COORDINATOR_CHARGESESSIONS, COORDINATOR_ADVANCED, DATA_CLIENT
-from .utils import in_slot
+from .utils import in_slot, now_ms
+from .detector import ChargingDetector
 from .base import OhmeEntity
 
 _LOGGER = logging.getLogger(__name__)
@@ -21,10 +20,10 @@ async def async_setup_entry(
     async_add_entities,
 ):
     """Setup sensors and configure coordinator."""
-    account_id = config_entry.data['email']
-    client = hass.data[DOMAIN][account_id][DATA_CLIENT]
-    coordinator = hass.data[DOMAIN][account_id][DATA_COORDINATORS][COORDINATOR_CHARGESESSIONS]
-    coordinator_advanced = hass.data[DOMAIN][account_id][DATA_COORDINATORS][COORDINATOR_ADVANCED]
+    runtime = config_entry.runtime_data
+    client = runtime.client
+    coordinator = runtime.charge_sessions
+    coordinator_advanced = runtime.advanced_settings
 
     sensors = [ConnectedBinarySensor(coordinator, hass, client),
                ChargingBinarySensor(coordinator, hass, client),
@@ -46,17 +45,23 @@ class ConnectedBinarySensor(
 
     @property
     def is_on(self) -> bool:
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Determine if car is connected."""
         if self.coordinator.data is None:
             self._state = False
         else:
             self._state = bool(self.coordinator.data["mode"] != "DISCONNECTED")
 
-        return self._state
+        self.async_write_ha_state()
 
 
 class ChargingBinarySensor(
         OhmeEntity,
-        BinarySensorEntity):
+        BinarySensorEntity,
+        RestoreEntity):
     """Binary sensor for if car is charging."""
 
     _attr_translation_key = "car_charging"
@@ -70,93 +75,37 @@ class ChargingBinarySensor(
             client):
         super().__init__(coordinator, hass, client)
 
-        # Cache the last power readings
-        self._last_reading = None
-        self._last_reading_in_slot = False
-
-        # State variables for charge state detection
-        self._trigger_count = 0
+        self._detector = ChargingDetector()
 
     @property
     def is_on(self) -> bool:
         return self._state
 
-    def _calculate_state(self) -> bool:
-        """Some trickery to get the charge state to update quickly."""
-        power = self.coordinator.data["power"]["watt"]
-
-        # If no last reading or no batterySoc/power, fallback to power > 0
-        if not self._last_reading or not self._last_reading['batterySoc'] or not self._last_reading['power']:
-            _LOGGER.debug("ChargingBinarySensor: No last reading, defaulting to power > 0")
-            return power > 0
-        
-        # See if we are in a charge slot now and if we were for the last reading
-        in_charge_slot = in_slot(self.coordinator.data)
-        lr_in_charge_slot = self._last_reading_in_slot
-        # Store this for next time
-        self._last_reading_in_slot = in_charge_slot
-
-        # If:
-        # - Power has dropped by 40%+ since the last reading
-        # - Last reading we were in a charge slot
-        # - Now we are not in a charge slot
-        # The charge has JUST stopped on the session bounary but the power reading is lagging.
-        # This condition makes sure we get the charge state updated on the tick immediately after charge stop.
-        lr_power = self._last_reading["power"]["watt"]
-        if lr_in_charge_slot and not in_charge_slot and lr_power > 0 and power / lr_power < 0.6:
-            _LOGGER.debug("ChargingBinarySensor: Power drop on state boundary, assuming not charging")
-            self._trigger_count = 0
-            return False
-        
-        # Failing that, we use the watt hours field to check charge state:
-        # - If Wh has positive delta
-        # - We have a nonzero power reading
-        # We are charging. Using the power reading isn't ideal - eg. quirk of MG ZS in #13, so need to revisit
-        wh_delta = self.coordinator.data['batterySoc']['wh'] - self._last_reading['batterySoc']['wh']
-        trigger_state = wh_delta > 0 and power > 0
-
-        _LOGGER.debug(f"ChargingBinarySensor: Reading Wh delta of {wh_delta} and power of {power}w")
-
-        # If state is going upwards, report straight away
-        if trigger_state and not self._state:
-            _LOGGER.debug("ChargingBinarySensor: Upwards state change, reporting immediately")
-            self._trigger_count = 0
-            return True
-
-        # If state is going to change (downwards only for now), we want to see 3 consecutive readings of the state having
-        # changed before reporting it.
-        if self._state != trigger_state:
-            _LOGGER.debug("ChargingBinarySensor: Downwards state change, incrementing counter")
-            self._trigger_count += 1
-            if self._trigger_count > 2:
-                _LOGGER.debug("ChargingBinarySensor: Counter hit, publishing downward state change")
-                self._trigger_count = 0
-                return trigger_state
-        else:
-            self._trigger_count = 0
+    @property
+    def extra_restore_state_data(self) -> RestoredExtraData:
+        """Save the detector context, so it doesn't start from scratch after a restart."""
+        return RestoredExtraData(self._detector.as_dict())
 
-        _LOGGER.debug("ChargingBinarySensor: Returning existing state")
-            
-        # State hasn't changed or we haven't seen 3 changed values - return existing state
-        return self._state
+    async def _async_restore_state(self) -> None:
+        last = await self.async_get_last_extra_data()
+        if last is not None:
+            self._detector.restore(last.as_dict(), utcnow().timestamp())
+            self._state = self._detector.state
 
     @callback
     def _handle_coordinator_update(self) -> None:
-        """Update data."""
-        # Don't accept updates if 5s hasnt passed
-        # State calculations use deltas that may be unreliable to check if requests are too often
-        if self._last_updated and (utcnow().timestamp() - self._last_updated.timestamp() < 5):
-            _LOGGER.debug("ChargingBinarySensor: State update too soon - suppressing")
-            return
+        """Feed the new reading to the charge state detector."""
+        data = self.coordinator.data
+        power = wh = None
 
         # If we have power info and the car is plugged in, calculate state. Otherwise, false
-        if self.coordinator.data and self.coordinator.data["power"] and self.coordinator.data['mode'] != "DISCONNECTED":
-            self._state = self._calculate_state()
-        else:
-            self._state = False
-            _LOGGER.debug("ChargingBinarySensor: No power data or car disconnected - reporting False")
+        if data and data["power"] and data['mode'] != "DISCONNECTED":
+            power = data["power"]["watt"]
+            wh = data['batterySoc']['wh'] if data['batterySoc'] else None
 
-        self._last_reading = self.coordinator.data
+        self._state = self._detector.update(
+            utcnow().timestamp(), power, wh, in_slot(self.coordinator.slot_index())
+        )
         self._last_updated = utcnow()
 
         self.async_write_ha_state()
@@ -172,13 +121,18 @@ class PendingApprovalBinarySensor(
 
     @property
     def is_on(self) -> bool:
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Determine if charge is pending approval."""
         if self.coordinator.data is None:
             self._state = False
         else:
             self._state = bool(
                 self.coordinator.data["mode"] == "PENDING_APPROVAL")
 
-        return self._state
+        self.async_write_ha_state()
 
 
 class CurrentSlotBinarySensor(
@@ -189,16 +143,35 @@ class CurrentSlotBinarySensor(
     _attr_translation_key = "slot_active"
     _attr_icon = "mdi:calendar-check"
 
-    @property
-    def extra_state_attributes(self):
-        """Attributes of the sensor."""
-        now = utcnow()
-        slots = self._hass.data[DOMAIN][self._client.email][DATA_SLOTS] if DATA_SLOTS in self._hass.data[DOMAIN][self._client.email] else []
-
-        return {
-            "planned_dispatches": [x for x in slots if not x['end'] or x['end'] > now],
-            "completed_dispatches": [x for x in slots if x['end'] < now]
+    # Slot plans can be long, so keep them out of the database
+    _unrecorded_attributes = frozenset({"planned_dispatches", "completed_dispatches"})
+
+    def __init__(
+            self,
+            coordinator: OhmeChargeSessionsCoordinator,
+            hass: HomeAssistant,
+            client):
+        super().__init__(coordinator, hass, client)
+
+        self._attr_extra_state_attributes = {
+            "planned_dispatches": [],
+            "completed_dispatches": []
+        }
+        self._dispatch_key = None
+
+    def _update_dispatches(self, now):
+        """Rebuild the dispatch attributes, only if the slots or their progress have changed."""
+        index = self.coordinator.slot_index()
+        key = (index.starts, index.ends, index.wh, index.wh_before, index.completed_count(now), index.completed_count(now + 1))
+        if key == self._dispatch_key:
+            return
+
+        planned, completed = index.dispatches(now)
+        self._attr_extra_state_attributes = {
+            "planned_dispatches": planned,
+            "completed_dispatches": completed
         }
+        self._dispatch_key = key
 
     @property
     def is_on(self) -> bool:
@@ -212,8 +185,9 @@ class CurrentSlotBinarySensor(
         elif self.coordinator.data["mode"] == "DISCONNECTED":
             self._state = False
         else:
-            self._state = in_slot(self.coordinator.data)
+            self._state = in_slot(self.coordinator.slot_index())
 
+        self._update_dispatches(now_ms())
         self._last_updated = utcnow()
 
         self.async_write_ha_state()
@@ -229,8 +203,14 @@ class ChargerOnlineBinarySensor(
 
     @property
     def is_on(self) -> bool:
-        if self.coordinator.data and self.coordinator.data["online"]:
-            return True
-        elif self.coordinator.data:
-            return False
-        return None
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Determine if charger is online."""
+        if self.coordinator.data:
+            self._state = bool(self.coordinator.data["online"])
+        else:
+            self._state = None
+
+        self.async_write_ha_state()
@@ -1,12 +1,9 @@
 from __future__ import annotations
 import logging
-import asyncio
 
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import generate_entity_id
 from homeassistant.components.button import ButtonEntity
 
-from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATORS, COORDINATOR_CHARGESESSIONS
 from .base import OhmeEntity
 
 _LOGGER = logging.getLogger(__name__)
@@ -18,10 +15,10 @@ async def async_setup_entry(
     async_add_entities
 ):
     """Setup switches."""
-    account_id = config_entry.data['email']
+    runtime = config_entry.runtime_data
 
-    client = hass.data[DOMAIN][account_id][DATA_CLIENT]
-    coordinator = hass.data[DOMAIN][account_id][DATA_COORDINATORS][COORDINATOR_CHARGESESSIONS]
+    client = runtime.client
+    coordinator = runtime.charge_sessions
 
     buttons = []
 
@@ -42,5 +39,4 @@ class OhmeApproveChargeButton(OhmeEntity, ButtonEntity):
         """Approve the charge."""
         await self._client.async_approve_charge()
 
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_refresh_after_command()
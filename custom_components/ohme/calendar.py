@@ -0,0 +1,67 @@
+from __future__ import annotations
+import logging
+from datetime import datetime
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.core import callback, HomeAssistant
+from .utils import get_option, now_ms, ms_to_datetime
+from .base import OhmeEntity
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities
+):
+    """Setup calendar."""
+    runtime = config_entry.runtime_data
+
+    client = runtime.client
+    coordinator = runtime.charge_sessions
+
+    async_add_entities([OhmeSlotCalendar(coordinator, hass, client)], update_before_add=True)
+
+
+class OhmeSlotCalendar(OhmeEntity, CalendarEntity):
+    """Calendar of smart charge slots."""
+    _attr_translation_key = "charge_slots"
+    _attr_icon = "mdi:calendar-clock"
+
+    def _collapse(self):
+        return not get_option(self._options, "never_collapse_slots", False)
+
+    def _event(self, start, end):
+        return CalendarEvent(
+            start=ms_to_datetime(start),
+            end=ms_to_datetime(end),
+            summary="Charge slot"
+        )
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        """Return pre-calculated current or next event."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Find the current or next slot from the slot index."""
+        slot = None
+        if self.coordinator.data is not None and self.coordinator.data["mode"] != "DISCONNECTED":
+            slot = self.coordinator.slot_index().upcoming(now_ms(), collapsed=self._collapse())
+
+        self._state = None if slot is None else self._event(*slot)
+
+        self.async_write_ha_state()
+
+    async def async_get_events(
+        self, hass: HomeAssistant, start_date: datetime, end_date: datetime
+    ) -> list[CalendarEvent]:
+        """Return slots overlapping the requested range."""
+        if self.coordinator.data is None or self.coordinator.data["mode"] == "DISCONNECTED":
+            return []
+
+        slots = self.coordinator.slot_index().in_range(
+            int(start_date.timestamp() * 1000), int(end_date.timestamp() * 1000), collapsed=self._collapse()
+        )
+        return [self._event(start, end) for start, end in slots]
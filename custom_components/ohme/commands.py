@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from collections import deque
+from time import perf_counter
+
+_LOGGER = logging.getLogger(__name__)
+
+# Number of command latencies kept for the average
+LATENCY_SAMPLES = 50
+
+
+class _Command:
+    """A queued command and everyone waiting on it."""
+
+    def __init__(self, key, func, kwargs, not_before=0):
+        self.key = key
+        self.func = func
+        self.kwargs = kwargs
+        self.not_before = not_before  # Loop time before which it isn't dispatched
+        self.waiters = []
+        self.submitted = perf_counter()
+
+
+class CommandQueue:
+    """Ordered queue of commands for a single charger.
+       Commands run one at a time in the order submitted. A command that hasn't been
+       dispatched yet is superseded by a later one with the same key, eg. a pause
+       followed by a resume only sends the resume. Everyone waiting on a superseded
+       command gets the result of the one that replaced it."""
+
+    def __init__(self):
+        self._queue = deque()
+        self._pending = {}
+        self._lock = asyncio.Lock()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # ms from submission to completion
+        self.superseded = 0
+        self.completed = 0
+
+    @property
+    def depth(self):
+        """Commands waiting to be dispatched."""
+        return len(self._queue)
+
+    @property
+    def last_latency(self):
+        return self.latencies[-1] if self.latencies else None
+
+    @property
+    def average_latency(self):
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+    async def submit(self, key, func, kwargs=None, merge=False, delay=0):
+        """Queue func(**kwargs) and wait for its result.
+           With merge, arguments are folded into a pending command with the same
+           key rather than replacing them. A delay holds the command back so that
+           others submitted shortly after can merge into it. Commands that are
+           ready are run in order while a held back one waits."""
+        kwargs = kwargs or {}
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        not_before = loop.time() + delay
+
+        command = self._pending.pop(key, None)
+        if command is not None:
+            self.superseded += 1
+            self._queue.remove(command)
+            _LOGGER.debug("Command %s superseded before dispatch", key)
+
+            if merge:
+                # The merge window runs from the first command merged in
+                replacement = _Command(key, func, {**command.kwargs, **kwargs}, min(command.not_before, not_before))
+            else:
+                replacement = _Command(key, func, kwargs, not_before)
+            replacement.waiters = command.waiters
+            replacement.submitted = command.submitted
+            command = replacement
+        else:
+            command = _Command(key, func, kwargs, not_before)
+
+        command.waiters.append(future)
+        self._queue.append(command)
+        self._pending[key] = command
+
+        try:
+            while not future.done():
+                held = self._holding(future)
+                if held is not None and held.not_before > loop.time():
+                    await asyncio.sleep(held.not_before - loop.time())
+                    continue
+
+                # Whoever holds the lock runs the commands that are ready until their own
+                # has finished, so there is always someone draining the queue while it has a waiter
+                async with self._lock:
+                    while not future.done():
+                        command = self._next_ready(loop.time())
+                        if command is None:
+                            break
+
+                        try:
+                            await self._dispatch(command)
+                        except asyncio.CancelledError:
+                            self._requeue(command, future)
+                            raise
+        except asyncio.CancelledError:
+            self._withdraw(future)
+            raise
+
+        return await future
+
+    def _holding(self, future):
+        """The queued command a future is waiting on, if it hasn't been dispatched."""
+        return next((command for command in self._queue if future in command.waiters), None)
+
+    def _next_ready(self, now):
+        """Take the first command that is no longer held back off the queue."""
+        for command in self._queue:
+            if command.not_before <= now:
+                self._queue.remove(command)
+                return command
+        return None
+
+    def _requeue(self, command, cancelled):
+        """Our caller was cancelled while running a command. Only their own wait is
+           cancelled, and the command goes back to the front of the queue for
+           whoever is still waiting on it."""
+        cancelled.cancel()
+        command.waiters = [waiter for waiter in command.waiters if not waiter.done()]
+        if not command.waiters:
+            return
+
+        self._queue.appendleft(command)
+        self._pending.setdefault(command.key, command)
+
+    def _withdraw(self, cancelled):
+        """Our caller was cancelled while waiting for their command. The command is
+           dropped if nobody else is waiting on it, so it isn't sent by the next caller."""
+        cancelled.cancel()
+        command = self._holding(cancelled)
+        if command is None:
+            return
+
+        command.waiters = [waiter for waiter in command.waiters if not waiter.done()]
+        if command.waiters:
+            return
+
+        self._queue.remove(command)
+        if self._pending.get(command.key) is command:
+            del self._pending[command.key]
+
+    async def _dispatch(self, command):
+        """Run a command and hand the result to its waiters."""
+        if self._pending.get(command.key) is command:
+            del self._pending[command.key]
+
+        try:
+            result = await command.func(**command.kwargs)
+        except Exception as ex:
+            for waiter in command.waiters:
+                if not waiter.done():
+                    waiter.set_exception(ex)
+        else:
+            for waiter in command.waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
+
+        self.completed += 1
+        self.latencies.append(round((perf_counter() - command.submitted) * 1000, 1))
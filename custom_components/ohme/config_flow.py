@@ -1,6 +1,6 @@
 import voluptuous as vol
 from homeassistant.config_entries import (ConfigFlow, OptionsFlow)
-from .const import DOMAIN, CONFIG_VERSION, DEFAULT_INTERVAL_CHARGESESSIONS, DEFAULT_INTERVAL_ACCOUNTINFO, DEFAULT_INTERVAL_ADVANCED, DEFAULT_INTERVAL_SCHEDULES
+from .const import DOMAIN, CONFIG_VERSION, DEFAULT_INTERVAL_CHARGESESSIONS, DEFAULT_INTERVAL_ACCOUNTINFO, DEFAULT_INTERVAL_ADVANCED, DEFAULT_INTERVAL_SCHEDULES, MIN_INTERVAL_SCHEDULES
 from .api_client import OhmeApiClient
 
 
@@ -21,12 +21,16 @@ class OhmeConfigFlow(ConfigFlow, domain=DOMAIN):
             await self.async_set_unique_id(info['email'])
             self._abort_if_unique_id_configured()
             instance = OhmeApiClient(info['email'], info['password'])
-            if await instance.async_refresh_session() is None:
+            success = await instance.async_refresh_session() is not None
+            await instance.async_close()
+
+            if not success:
                 errors["base"] = "auth_error"
             else:
+                # Keep the token so setup doesn't need to log in again
                 return self.async_create_entry(
                     title=info['email'],
-                    data=info
+                    data={**info, "token": instance.token}
                 )
 
         return self.async_show_form(
@@ -47,16 +51,20 @@ class OhmeOptionsFlow(OptionsFlow):
         errors = {}
         # If form filled
         if options is not None:
-            data = self._config_entry.data
+            data = dict(self._config_entry.data)
 
             # Update credentials
             if 'email' in options and 'password' in options:
                 instance = OhmeApiClient(options['email'], options['password'])
-                if await instance.async_refresh_session() is None:
+                success = await instance.async_refresh_session() is not None
+                await instance.async_close()
+
+                if not success:
                     errors["base"] = "auth_error"
                 else:
                     data['email'] = options['email']
                     data['password'] = options['password']
+                    data['token'] = instance.token
 
             # If we have no errors, update the data array
             if len(errors) == 0:
@@ -64,12 +72,12 @@ class OhmeOptionsFlow(OptionsFlow):
                 options.pop('email', None)
                 options.pop('password', None)
 
-                # Update data
+                # Update data and options together, so the update listener only runs once.
+                # Creating the entry below then finds the options already saved
                 self.hass.config_entries.async_update_entry(
-                    self._config_entry, data=data
+                    self._config_entry, data=data, options=options
                 )
 
-                # Update options
                 return self.async_create_entry(
                     title="",
                     data=options
@@ -90,6 +98,9 @@ class OhmeOptionsFlow(OptionsFlow):
                         vol.Required(
                             "never_collapse_slots", default=self._config_entry.options.get("never_collapse_slots", False)
                         ) : bool,
+                        vol.Required(
+                            "hedge_requests", default=self._config_entry.options.get("hedge_requests", False)
+                        ) : bool,
                         vol.Required(
                             "interval_chargesessions", default=self._config_entry.options.get("interval_chargesessions", DEFAULT_INTERVAL_CHARGESESSIONS)
                         ) : vol.All(vol.Coerce(float), vol.Clamp(min=DEFAULT_INTERVAL_CHARGESESSIONS)),
@@ -101,6 +112,6 @@ class OhmeOptionsFlow(OptionsFlow):
                         ) : vol.All(vol.Coerce(float), vol.Clamp(min=DEFAULT_INTERVAL_ADVANCED)),
                         vol.Required(
                             "interval_schedules", default=self._config_entry.options.get("interval_schedules", DEFAULT_INTERVAL_SCHEDULES)
-                        ) : vol.All(vol.Coerce(float), vol.Clamp(min=DEFAULT_INTERVAL_SCHEDULES))
+                        ) : vol.All(vol.Coerce(float), vol.Clamp(min=MIN_INTERVAL_SCHEDULES))
                     }), errors=errors
         )
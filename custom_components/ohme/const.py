@@ -2,23 +2,74 @@
 DOMAIN = "ohme"
 USER_AGENT = "dan-r-homeassistant-ohme"
 INTEGRATION_VERSION = "1.1.1"
-CONFIG_VERSION = 1
-ENTITY_TYPES = ["sensor", "binary_sensor", "switch", "button", "number", "time"]
+CONFIG_VERSION = 2
+ENTITY_TYPES = ["sensor", "binary_sensor", "switch", "button", "number", "time", "calendar"]
 
-DATA_CLIENT = "client"
-DATA_COORDINATORS = "coordinators"
-DATA_OPTIONS = "options"
-DATA_SLOTS = "slots"
-
-COORDINATOR_CHARGESESSIONS = 0
-COORDINATOR_ACCOUNTINFO = 1
-COORDINATOR_ADVANCED = 2
-COORDINATOR_SCHEDULES = 3
+# Charger capabilities with a configuration switch, and the switch's translation key
+SETTINGS_CAPABILITIES = {
+    "buttonsLockable": "lock_buttons",
+    "pluginsRequireApprovalMode": "require_approval",
+    "stealth": "sleep_when_inactive"
+}
 
 DEFAULT_INTERVAL_CHARGESESSIONS = 0.5
 DEFAULT_INTERVAL_ACCOUNTINFO = 1
 DEFAULT_INTERVAL_ADVANCED = 1
-DEFAULT_INTERVAL_SCHEDULES = 10
+DEFAULT_INTERVAL_SCHEDULES = 30
+# Schedules used to default to 10 minutes, so that stays the minimum for anyone who set it
+MIN_INTERVAL_SCHEDULES = 10
+
+# Coordinators refreshed straight away on charge state transitions, so they can poll less often
+TRANSITION_REFRESH = {
+    "plugged_in": ["advanced_settings"],
+    "unplugged": ["advanced_settings", "charge_schedules"],
+    "approved": ["charge_schedules"],
+    "finished": ["advanced_settings", "charge_schedules"]
+}
+
+# Request timeouts (seconds) per endpoint. Charge sessions feeds most entities, so it gives up
+# sooner and is tried again on the next refresh rather than holding everything up
+DEFAULT_REQUEST_TIMEOUT = 10
+REQUEST_TIMEOUTS = {
+    "charge_sessions": 5,
+    "advanced_settings": 5,
+    "account": 10,
+    "schedules": 10,
+    "settings": 10,
+    "command": 10
+}
+
+# Hedged charge session requests. A second request is sent if the first hasn't
+# returned by the observed p95, once there are enough samples to know what that is
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.25          # Seconds
+
+# Response bodies bigger than this (bytes received) are decoded in the executor
+DECODE_EXECUTOR_BYTES = 32768
+
+# Seconds to wait for other app setting changes so they go in one request
+SETTINGS_BATCH_WINDOW = 0.5
+
+# Seconds a schedule or account snapshot can be trusted to skip a write that changes nothing.
+# Changes made in the Ohme app since then would otherwise stop us writing the old value back
+SNAPSHOT_MAX_AGE = 60
+
+# Charging detector defaults. Tune with tools/replay_charging.py
+DETECTOR_WINDOW = 6             # Samples kept
+DETECTOR_MIN_INTERVAL = 5       # Seconds between accepted samples
+DETECTOR_BOUNDARY_DROP = 0.6    # Power ratio at a slot end that means charging has stopped
+DETECTOR_OFF_READINGS = 3       # Consecutive readings needed to report charging stopped
+DETECTOR_WH_WINDOW = 1          # Samples back to compare Wh against
+DETECTOR_MIN_WH_DELTA = 0       # Wh increase needed to count as charging
+DETECTOR_MIN_POWER = 0          # Power (W) needed to count as charging
+DETECTOR_RESTORE_MAX_AGE = 900  # Seconds after which saved samples are too old to restore
+
+# Cold start budgets (ms). Measure with tools/profile_startup.py
+IMPORT_BUDGET_MS = 50           # Importing the integration package, excluding Home Assistant itself
+SETUP_BUDGET_MS = 5000          # async_setup_entry, dominated by API round trips
+
+# Number of chargeGraph points and power readings kept per session
+SESSION_BUFFER_SIZE = 120
 
 LEGACY_MAPPING = {
     "ohme_car_charging": "car_charging",
@@ -1,4 +1,8 @@
+from __future__ import annotations
+from collections.abc import Mapping
+from dataclasses import dataclass, field
 from datetime import timedelta
+import asyncio
 import logging
 
 from homeassistant.helpers.update_coordinator import (
@@ -6,50 +10,153 @@ from homeassistant.helpers.update_coordinator import (
     UpdateFailed
 )
 
-from .const import DOMAIN, DATA_CLIENT, DEFAULT_INTERVAL_CHARGESESSIONS, DEFAULT_INTERVAL_ACCOUNTINFO, DEFAULT_INTERVAL_ADVANCED, DEFAULT_INTERVAL_SCHEDULES
-from .utils import get_option
+from .const import DEFAULT_INTERVAL_CHARGESESSIONS, DEFAULT_INTERVAL_ACCOUNTINFO, DEFAULT_INTERVAL_ADVANCED, DEFAULT_INTERVAL_SCHEDULES
+from .utils import get_option, now_ms, SlotCache
+from .session import SessionStats
+from .transitions import session_transitions, SessionEvents
+from .energy_statistics import EnergyStatisticsImporter
+from .archive import SessionArchive, SessionTracker, archive_path
+from .api_client import OhmeApiClient
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class OhmeChargeSessionsCoordinator(DataUpdateCoordinator):
+class OhmeCoordinator(DataUpdateCoordinator):
+    """Base for our coordinators."""
+
+    # Option holding the refresh interval (minutes), and its default
+    interval_option = None
+    default_interval = None
+
+    _command_refresh = None
+
+    def interval(self, options):
+        """Refresh interval from the config entry options."""
+        return timedelta(minutes=get_option(options, self.interval_option, self.default_interval))
+
+    def apply_options(self, options):
+        """Pick up a changed refresh interval in place. It applies from the next scheduled refresh."""
+        self.update_interval = self.interval(options)
+
+    async def async_refresh_after_command(self, delay=1):
+        """Refresh once a command has had time to apply.
+           Callers that arrive while one is pending share it, so a batch of
+           commands only causes one refresh."""
+        if self._command_refresh is None or self._command_refresh.done():
+            self._command_refresh = self.hass.async_create_task(self._async_delayed_refresh(delay))
+
+        await asyncio.shield(self._command_refresh)
+
+    async def _async_delayed_refresh(self, delay):
+        await asyncio.sleep(delay)
+        await self.async_refresh()
+
+
+class OhmeChargeSessionsCoordinator(OhmeCoordinator):
     """Coordinator to pull main charge state and power/current draw."""
 
-    def __init__(self, hass, account_id):
+    interval_option = "interval_chargesessions"
+    default_interval = DEFAULT_INTERVAL_CHARGESESSIONS
+
+    def __init__(self, hass, client, options):
         """Initialise coordinator."""
         super().__init__(
             hass,
             _LOGGER,
             name="Ohme Charge Sessions",
-            update_interval=timedelta(minutes=
-                get_option(hass, account_id, "interval_chargesessions", DEFAULT_INTERVAL_CHARGESESSIONS)
-            ),
+            update_interval=self.interval(options),
         )
-        self._client = hass.data[DOMAIN][account_id][DATA_CLIENT]
+        self._client = client
+
+        # Incremented for every payload so derived data can be cached against it
+        self.data_version = 0
+        # Charge state transitions seen in the latest payload
+        self.transitions = set()
+        self.session_events = SessionEvents()
+        self.slot_cache = SlotCache()
+        self.session_stats = SessionStats()
+        self.energy_statistics = EnergyStatisticsImporter(hass, self._client.serial)
+        self.session_tracker = SessionTracker()
+        self._tracker_loaded = False
+        self.archive = SessionArchive(archive_path(hass, self._client.serial))
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
+        self.transitions = set()
         try:
-            return await self._client.async_get_charge_sessions()
+            data = await self._client.async_get_charge_sessions()
 
         except BaseException:
             raise UpdateFailed("Error communicating with API")
 
+        self.data_version += 1
+        self.transitions = session_transitions(self.data, data)
+        self.session_stats.update(data)
+
+        # Typed events so automations don't need template triggers over entity states
+        for event_type, event_data in self.session_events.update(
+            self.data, data, self.slot_cache.index(self.data_version, data), now_ms()
+        ):
+            self.hass.bus.async_fire(event_type, {**event_data, "serial": self._client.serial})
+
+        # Statistics are a nice to have, so don't fail the update over them
+        try:
+            await self.energy_statistics.async_update(data)
+        except Exception as ex:
+            _LOGGER.warning("Failed to import energy statistics: %s", ex)
+
+        try:
+            await self._async_archive(data)
+        except Exception as ex:
+            _LOGGER.warning("Failed to archive charge session: %s", ex)
+
+        return data
+
+    async def _async_archive(self, data):
+        """Archive the session if it has just ended, saving the one in progress."""
+        if not self._tracker_loaded:
+            state = await self.hass.async_add_executor_job(self.archive.load_tracker)
+            if state:
+                self.session_tracker.restore(state)
+            self._tracker_loaded = True
+
+        now = now_ms()
+        record = self.session_tracker.update(data, now)
+        if record:
+            await self.hass.async_add_executor_job(self.archive.append, record)
+
+        if self.session_tracker.save_due(now):
+            await self.hass.async_add_executor_job(self.archive.save_tracker, self.session_tracker.as_dict())
+            self.session_tracker.saved(now)
+
+    def slots(self):
+        """Slot list for the current payload, shared between all entities."""
+        return self.slot_cache.get(self.data_version, self.data)
+
+    def slot_index(self):
+        """Slot interval index for the current payload."""
+        return self.slot_cache.index(self.data_version, self.data)
 
-class OhmeAccountInfoCoordinator(DataUpdateCoordinator):
+    def forecast(self):
+        """Charge forecast interpolation table for the current payload."""
+        return self.slot_cache.forecast(self.data_version, self.data)
+
+
+class OhmeAccountInfoCoordinator(OhmeCoordinator):
     """Coordinator to pull charger settings."""
 
-    def __init__(self, hass, account_id):
+    interval_option = "interval_accountinfo"
+    default_interval = DEFAULT_INTERVAL_ACCOUNTINFO
+
+    def __init__(self, hass, client, options):
         """Initialise coordinator."""
         super().__init__(
             hass,
             _LOGGER,
             name="Ohme Account Info",
-            update_interval=timedelta(minutes=
-                get_option(hass, account_id, "interval_accountinfo", DEFAULT_INTERVAL_ACCOUNTINFO)
-            ),
+            update_interval=self.interval(options),
         )
-        self._client = hass.data[DOMAIN][account_id][DATA_CLIENT]
+        self._client = client
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
@@ -60,20 +167,21 @@ class OhmeAccountInfoCoordinator(DataUpdateCoordinator):
             raise UpdateFailed("Error communicating with API")
 
 
-class OhmeAdvancedSettingsCoordinator(DataUpdateCoordinator):
+class OhmeAdvancedSettingsCoordinator(OhmeCoordinator):
     """Coordinator to pull CT clamp reading."""
 
-    def __init__(self, hass, account_id):
+    interval_option = "interval_advanced"
+    default_interval = DEFAULT_INTERVAL_ADVANCED
+
+    def __init__(self, hass, client, options):
         """Initialise coordinator."""
         super().__init__(
             hass,
             _LOGGER,
             name="Ohme Advanced Settings",
-            update_interval=timedelta(minutes=
-                get_option(hass, account_id, "interval_advanced", DEFAULT_INTERVAL_ADVANCED)
-            ),
+            update_interval=self.interval(options),
         )
-        self._client = hass.data[DOMAIN][account_id][DATA_CLIENT]
+        self._client = client
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
@@ -84,20 +192,21 @@ class OhmeAdvancedSettingsCoordinator(DataUpdateCoordinator):
             raise UpdateFailed("Error communicating with API")
 
 
-class OhmeChargeSchedulesCoordinator(DataUpdateCoordinator):
+class OhmeChargeSchedulesCoordinator(OhmeCoordinator):
     """Coordinator to pull charge schedules."""
 
-    def __init__(self, hass, account_id):
+    interval_option = "interval_schedules"
+    default_interval = DEFAULT_INTERVAL_SCHEDULES
+
+    def __init__(self, hass, client, options):
         """Initialise coordinator."""
         super().__init__(
             hass,
             _LOGGER,
             name="Ohme Charge Schedules",
-            update_interval=timedelta(minutes=
-                get_option(hass, account_id, "interval_schedules", DEFAULT_INTERVAL_SCHEDULES)
-            ),
+            update_interval=self.interval(options),
         )
-        self._client = hass.data[DOMAIN][account_id][DATA_CLIENT]
+        self._client = client
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
@@ -106,3 +215,33 @@ class OhmeChargeSchedulesCoordinator(DataUpdateCoordinator):
 
         except BaseException:
             raise UpdateFailed("Error communicating with API")
+
+
+@dataclass
+class OhmeRuntimeData:
+    """Everything a loaded config entry needs, stored on entry.runtime_data."""
+
+    client: OhmeApiClient
+    charge_sessions: OhmeChargeSessionsCoordinator
+    account_info: OhmeAccountInfoCoordinator | None
+    advanced_settings: OhmeAdvancedSettingsCoordinator
+    charge_schedules: OhmeChargeSchedulesCoordinator
+    options: Mapping
+    platforms: list[str]
+    setup_timings: dict = field(default_factory=dict)
+
+    def coordinators(self) -> list[OhmeCoordinator]:
+        """The coordinators in use. Account info is only polled if something will use it."""
+        return [
+            coordinator for coordinator in (
+                self.charge_sessions,
+                self.account_info,
+                self.advanced_settings,
+                self.charge_schedules
+            ) if coordinator is not None
+        ]
+
+    @property
+    def slot_cache(self) -> SlotCache:
+        """Slot cache shared by all entities, owned by the charge sessions coordinator."""
+        return self.charge_sessions.slot_cache
@@ -0,0 +1,115 @@
+from collections import deque
+import logging
+from .const import (
+    DETECTOR_WINDOW, DETECTOR_MIN_INTERVAL, DETECTOR_BOUNDARY_DROP,
+    DETECTOR_OFF_READINGS, DETECTOR_WH_WINDOW, DETECTOR_MIN_WH_DELTA, DETECTOR_MIN_POWER,
+    DETECTOR_RESTORE_MAX_AGE
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ChargingDetector:
+    """Streaming charge state detector.
+       Holds a small window of (timestamp, W, Wh, in slot) samples and decides
+       whether the car is charging, reporting upward changes straight away and
+       waiting for confirmation before reporting downward ones."""
+
+    def __init__(
+            self,
+            window=DETECTOR_WINDOW,
+            min_interval=DETECTOR_MIN_INTERVAL,
+            boundary_drop=DETECTOR_BOUNDARY_DROP,
+            off_readings=DETECTOR_OFF_READINGS,
+            wh_window=DETECTOR_WH_WINDOW,
+            min_wh_delta=DETECTOR_MIN_WH_DELTA,
+            min_power=DETECTOR_MIN_POWER):
+        self.min_interval = min_interval
+        self.boundary_drop = boundary_drop
+        self.off_readings = off_readings
+        self.wh_window = min(wh_window, window)
+        self.min_wh_delta = min_wh_delta
+        self.min_power = min_power
+
+        self.samples = deque(maxlen=max(window, 1))
+        self.state = False
+        self.trigger_count = 0
+
+    def update(self, ts, power, wh, in_slot):
+        """Fold in a sample and return the charge state.
+           power and wh are None if there is no reading, eg. car disconnected."""
+        if self.samples and ts - self.samples[-1][0] < self.min_interval:
+            # Deltas are unreliable if readings are too close together
+            _LOGGER.debug("ChargingDetector: Sample too soon - suppressing")
+            return self.state
+
+        self.state = self._calculate(power, wh, in_slot)
+        self.samples.append((ts, power, wh, in_slot))
+        return self.state
+
+    def as_dict(self):
+        """Context to save across restarts."""
+        return {
+            "state": self.state,
+            "trigger_count": self.trigger_count,
+            "samples": [list(sample) for sample in self.samples]
+        }
+
+    def restore(self, data, now, max_age=DETECTOR_RESTORE_MAX_AGE):
+        """Restore saved context. Samples that are too old to compare against are dropped."""
+        self.state = bool(data.get("state", False))
+        self.trigger_count = data.get("trigger_count", 0)
+
+        self.samples.clear()
+        for sample in data.get("samples") or []:
+            if now - sample[0] <= max_age:
+                self.samples.append(tuple(sample))
+
+    def _calculate(self, power, wh, in_slot):
+        if power is None:
+            _LOGGER.debug("ChargingDetector: No power data or car disconnected - reporting False")
+            self.trigger_count = 0
+            return False
+
+        last = self.samples[-1] if self.samples else None
+
+        # If no last reading or no Wh/power, fallback to power > 0
+        if last is None or last[1] is None or last[2] is None or wh is None:
+            _LOGGER.debug("ChargingDetector: No last reading, defaulting to power > 0")
+            return power > self.min_power
+
+        # The charge has just stopped on a slot boundary but the power reading is lagging.
+        # This makes sure we report the change on the tick immediately after the charge stops.
+        if last[3] and not in_slot and last[1] > 0 and power / last[1] < self.boundary_drop:
+            _LOGGER.debug("ChargingDetector: Power drop on slot boundary, assuming not charging")
+            self.trigger_count = 0
+            return False
+
+        # Charging if Wh has gone up across the window and we have power
+        reference = last[2]
+        for sample in list(self.samples)[-self.wh_window:]:
+            if sample[2] is not None:
+                reference = sample[2]
+                break
+
+        wh_delta = wh - reference
+        trigger_state = wh_delta > self.min_wh_delta and power > self.min_power
+
+        _LOGGER.debug(f"ChargingDetector: Reading Wh delta of {wh_delta} and power of {power}w")
+
+        # If state is going upwards, report straight away
+        if trigger_state and not self.state:
+            self.trigger_count = 0
+            return True
+
+        # Downward changes need several consecutive readings before being reported
+        if self.state != trigger_state:
+            self.trigger_count += 1
+            if self.trigger_count >= self.off_readings:
+                _LOGGER.debug("ChargingDetector: Counter hit, publishing downward state change")
+                self.trigger_count = 0
+                return trigger_state
+        else:
+            self.trigger_count = 0
+
+        return self.state
@@ -0,0 +1,141 @@
+from bisect import bisect_left
+from datetime import datetime, timezone
+import logging
+from homeassistant.const import UnitOfEnergy
+from homeassistant.util import slugify
+from .const import DOMAIN
+from .session import graph_time_ms, hourly_energy
+from .utils import now_ms
+
+_LOGGER = logging.getLogger(__name__)
+
+HOUR_MS = 3600000
+
+
+class EnergyStatisticsImporter:
+    """Import session energy from chargeGraph into hourly long-term statistics.
+       Each poll only walks the points after the last hour written, and the hour
+       in progress is flushed when the session ends, and written again if more energy
+       turns up in it, eg. from a new session. The statistic's state is the
+       cumulative session Wh at the end of each hour, so the next hour is counted
+       from it even after a restart."""
+
+    def __init__(self, hass, serial):
+        self._hass = hass
+        self.statistic_id = f"{DOMAIN}:{slugify(serial)}_energy"
+        self._loaded = False
+        self._imported_until = None  # Start of the last hour written, epoch ms
+        self._last_sum = 0
+        self._last_wh = 0  # Cumulative session Wh at the end of the last hour written
+        self._open = None  # (hour start ms, cumulative Wh, last point ms) for the hour in progress
+        self._flushed_until = None  # Last point ms counted in an hour flushed before it was over
+
+    async def async_update(self, data, now=None):
+        """Import any newly completed hours from this payload."""
+        # Recorder is only imported once we know it is loaded
+        if "recorder" not in self._hass.config.components:
+            return
+
+        if not self._loaded:
+            await self._async_load_last()
+            self._loaded = True
+
+        points = ((data or {}).get('chargeGraph') or {}).get('points')
+        if not data or data.get('mode') == "DISCONNECTED" or not points:
+            # The session is over, so the hour in progress won't get any more energy
+            if self._open is not None:
+                hour, wh, last_ts = self._open
+                await self._async_import([(hour, wh)])
+                self._flushed_until = last_ts
+                self._open = None
+            return
+
+        now = now_ms() if now is None else now
+
+        # Points in a flushed hour after those already counted are added to it
+        if self._flushed_until is not None:
+            start = self._flushed_until + 1
+        else:
+            start = 0 if self._imported_until is None else self._imported_until + HOUR_MS
+
+        # A session that began after the last point counted counts from zero
+        if self._imported_until is None or graph_time_ms(points[0]['x']) >= start:
+            self._last_wh = 0
+
+        new = [
+            (graph_time_ms(point['x']), point['y'])
+            for point in points[bisect_left(points, start, key=lambda point: graph_time_ms(point['x'])):]
+        ]
+        if not new:
+            return
+
+        hours = hourly_energy(new, now)
+        if hours:
+            await self._async_import(hours)
+
+        # Points left over are in the hour in progress
+        last_ts, last_wh = new[-1]
+        last_hour = last_ts - last_ts % HOUR_MS
+        self._open = (last_hour, last_wh, last_ts) if last_hour + HOUR_MS > now else None
+
+    async def _async_import(self, hours):
+        """Write (hour start ms, cumulative Wh) rows following on from the last one.
+           A row for an hour already written replaces it."""
+        statistics = []
+        running_sum = self._last_sum
+        previous = self._last_wh
+        for hour, wh in hours:
+            # Energy going backwards means a new session has started
+            if wh < previous:
+                previous = 0
+
+            running_sum += wh - previous
+            statistics.append(
+                {
+                    "start": datetime.fromtimestamp(hour / 1000, tz=timezone.utc),
+                    "state": wh,
+                    "sum": running_sum
+                }
+            )
+            previous = wh
+
+        _LOGGER.debug("Importing %s hours of energy statistics to %s", len(statistics), self.statistic_id)
+        self._async_write(statistics)
+
+        self._imported_until = hours[-1][0]
+        self._last_sum = running_sum
+        self._last_wh = previous
+        self._flushed_until = None
+
+    def _async_write(self, statistics):
+        """Add StatisticData rows to the recorder."""
+        from homeassistant.components.recorder.models import StatisticMetaData
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+        async_add_external_statistics(
+            self._hass,
+            StatisticMetaData(
+                has_mean=False,
+                has_sum=True,
+                name="Ohme Energy",
+                source=DOMAIN,
+                statistic_id=self.statistic_id,
+                unit_of_measurement=UnitOfEnergy.WATT_HOUR
+            ),
+            statistics
+        )
+
+    async def _async_load_last(self):
+        """Find where the recorder's copy of the statistic ends."""
+        from homeassistant.components.recorder import get_instance
+        from homeassistant.components.recorder.statistics import get_last_statistics
+
+        last = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics, self._hass, 1, self.statistic_id, True, {"state", "sum"}
+        )
+
+        if last.get(self.statistic_id):
+            row = last[self.statistic_id][0]
+            self._imported_until = int(row['start'] * 1000)
+            self._last_sum = row['sum'] or 0
+            self._last_wh = row['state'] or 0
@@ -0,0 +1,49 @@
+import math
+from collections import deque
+
+# Number of latencies kept per endpoint
+LATENCY_WINDOW = 100
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a collection of samples."""
+    if not samples:
+        return None
+
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+
+class LatencyTracker:
+    """Rolling request latencies (ms) for one endpoint."""
+
+    def __init__(self, maxlen=LATENCY_WINDOW):
+        self.attempts = deque(maxlen=maxlen)  # Each request sent, used to pick the hedge delay
+        self.requests = deque(maxlen=maxlen)  # Each call as seen by the caller, including any hedge
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+        # Payload sizes in bytes, as received and once decompressed
+        self.compressed_bytes = None
+        self.raw_bytes = None
+
+    def hedge_delay(self, min_samples):
+        """The p95 of single requests, once there are enough of them to trust."""
+        if len(self.attempts) < min_samples:
+            return None
+        return percentile(self.attempts, 95)
+
+    def summary(self):
+        """Tail latency figures for the calls seen by the caller."""
+        return {
+            "p50": percentile(self.requests, 50),
+            "p95": percentile(self.requests, 95),
+            "p99": percentile(self.requests, 99),
+            "max": max(self.requests) if self.requests else None,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "compressed_bytes": self.compressed_bytes,
+            "raw_bytes": self.raw_bytes
+        }
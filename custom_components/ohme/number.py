@@ -1,14 +1,17 @@
 from __future__ import annotations
-import asyncio
 from homeassistant.components.number import NumberEntity, NumberDeviceClass
 from homeassistant.components.number.const import NumberMode, PERCENTAGE
 from homeassistant.const import UnitOfTime
-from homeassistant.helpers.entity import generate_entity_id
 from homeassistant.core import callback, HomeAssistant
-from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATORS, COORDINATOR_ACCOUNTINFO, COORDINATOR_CHARGESESSIONS, COORDINATOR_SCHEDULES
 from .utils import session_in_progress
 from .base import OhmeEntity
 
+# Minor currency units for the price cap
+PENNY_UNITS = {
+    "GBP": "p",
+    "EUR": "c"
+}
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -16,19 +19,17 @@ async def async_setup_entry(
     async_add_entities
 ):
     """Setup switches and configure coordinator."""
-    account_id = config_entry.data['email']
-
-    coordinators = hass.data[DOMAIN][account_id][DATA_COORDINATORS]
-    client = hass.data[DOMAIN][account_id][DATA_CLIENT]
+    runtime = config_entry.runtime_data
+    client = runtime.client
 
     numbers = [TargetPercentNumber(
-        coordinators[COORDINATOR_CHARGESESSIONS], coordinators[COORDINATOR_SCHEDULES], hass, client),
+        runtime.charge_sessions, runtime.charge_schedules, hass, client),
         PreconditioningNumber(
-        coordinators[COORDINATOR_CHARGESESSIONS], coordinators[COORDINATOR_SCHEDULES], hass, client)]
+        runtime.charge_sessions, runtime.charge_schedules, hass, client)]
 
     if client.cap_available():
         numbers.append(
-            PriceCapNumber(coordinators[COORDINATOR_ACCOUNTINFO], hass, client)
+            PriceCapNumber(runtime.account_info, hass, client)
         )
 
     async_add_entities(numbers, update_before_add=True)
@@ -58,26 +59,26 @@ class TargetPercentNumber(OhmeEntity, NumberEntity):
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
         # If session in progress, update this session, if not update the first schedule
-        if session_in_progress(self.hass, self._client.email, self.coordinator.data):
-            await self._client.async_apply_session_rule(target_percent=int(value))
-            await asyncio.sleep(1)
-            await self.coordinator.async_refresh()
+        if session_in_progress(self._options, self.coordinator.data):
+            if await self._client.async_apply_session_rule(target_percent=int(value)):
+                await self.coordinator.async_refresh_after_command()
         else:
-            await self._client.async_update_schedule(target_percent=int(value))
-            await asyncio.sleep(1)
-            await self.coordinator_schedules.async_refresh()
+            if await self._client.async_update_schedule(target_percent=int(value)):
+                await self.coordinator_schedules.async_refresh_after_command()
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
         # Set with the same logic as reading
-        if session_in_progress(self.hass, self._client.email, self.coordinator.data):
+        target = None
+        if session_in_progress(self._options, self.coordinator.data):
             target = round(
                 self.coordinator.data['appliedRule']['targetPercent'])
         elif self.coordinator_schedules.data:
             target = round(self.coordinator_schedules.data['targetPercent'])
 
-        self._state = target if target > 0 else None
+        self._state = target if target and target > 0 else None
+        self.async_write_ha_state()
 
     @property
     def native_value(self):
@@ -110,27 +111,29 @@ class PreconditioningNumber(OhmeEntity, NumberEntity):
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
         # If session in progress, update this session, if not update the first schedule
-        if session_in_progress(self.hass, self._client.email, self.coordinator.data):
+        if session_in_progress(self._options, self.coordinator.data):
             if value == 0:
-                await self._client.async_apply_session_rule(pre_condition=False)
+                changed = await self._client.async_apply_session_rule(pre_condition=False)
             else:
-                await self._client.async_apply_session_rule(pre_condition=True, pre_condition_length=int(value))
-            await asyncio.sleep(1)
-            await self.coordinator.async_refresh()
+                changed = await self._client.async_apply_session_rule(pre_condition=True, pre_condition_length=int(value))
+
+            if changed:
+                await self.coordinator.async_refresh_after_command()
         else:
             if value == 0:
-                await self._client.async_update_schedule(pre_condition=False)
+                changed = await self._client.async_update_schedule(pre_condition=False)
             else:
-                await self._client.async_update_schedule(pre_condition=True, pre_condition_length=int(value))
-            await asyncio.sleep(1)
-            await self.coordinator_schedules.async_refresh()
+                changed = await self._client.async_update_schedule(pre_condition=True, pre_condition_length=int(value))
+
+            if changed:
+                await self.coordinator_schedules.async_refresh_after_command()
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
         precondition = None
         # Set with the same logic as reading
-        if session_in_progress(self.hass, self._client.email, self.coordinator.data):
+        if session_in_progress(self._options, self.coordinator.data):
             enabled = self.coordinator.data['appliedRule'].get(
                 'preconditioningEnabled', False)
             precondition = 0 if not enabled else self.coordinator.data['appliedRule'].get(
@@ -142,6 +145,7 @@ class PreconditioningNumber(OhmeEntity, NumberEntity):
                 'preconditionLengthMins', None)
 
         self._state = precondition
+        self.async_write_ha_state()
 
     @property
     def native_value(self):
@@ -159,24 +163,8 @@ class PriceCapNumber(OhmeEntity, NumberEntity):
 
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
-        await self._client.async_change_price_cap(cap=value)
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
-
-    @property
-    def native_unit_of_measurement(self):
-        if self.coordinator.data is None:
-            return None
-
-        penny_unit = {
-            "GBP": "p",
-            "EUR": "c"
-        }
-        currency = self.coordinator.data["userSettings"].get(
-            "currencyCode", "XXX")
-
-        return penny_unit.get(currency, f"{currency}/100")
+        if await self._client.async_change_price_cap(cap=value):
+            await self.coordinator.async_refresh_after_command()
 
     @callback
     def _handle_coordinator_update(self) -> None:
@@ -186,6 +174,13 @@ class PriceCapNumber(OhmeEntity, NumberEntity):
                 self._state = self.coordinator.data["userSettings"]["chargeSettings"][0]["value"]
             except:
                 self._state = None
+
+            currency = self.coordinator.data["userSettings"].get(
+                "currencyCode", "XXX")
+            self._attr_native_unit_of_measurement = PENNY_UNITS.get(currency, f"{currency}/100")
+        else:
+            self._attr_native_unit_of_measurement = None
+
         self.async_write_ha_state()
 
     @property
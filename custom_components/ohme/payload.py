@@ -0,0 +1,55 @@
+import zlib
+from homeassistant.util.json import json_loads
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only ask for brotli if we can decode it
+ACCEPT_ENCODING = "br, gzip" if brotli else "gzip"
+
+# Charge session fields read by the integration, and the only ones kept. The whole body is
+# still parsed, as there's no selective decoder to hand, but nothing else is held on to
+CHARGE_SESSION_FIELDS = (
+    "mode",
+    "startTime",
+    "power",
+    "car",
+    "batterySoc",
+    "batterySocBefore",
+    "appliedRule",
+    "allSessionSlots",
+    "chargeGraph"
+)
+
+
+def decompress(body, encoding):
+    """Undo the response content encoding."""
+    if encoding == "gzip":
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompress(body)
+    if encoding == "br" and brotli:
+        return brotli.decompress(body)
+    return body
+
+
+def select_fields(data, fields):
+    """Keep only the given keys of an object, or of each object in a list."""
+    if isinstance(data, list):
+        return [select_fields(item, fields) for item in data]
+    if isinstance(data, dict):
+        return {key: data[key] for key in fields if key in data}
+    return data
+
+
+def decode_body(body, encoding, fields=None):
+    """Decompress and decode a JSON response body. Returns (data, decoded size in bytes).
+       With fields, only those keys are kept from the decoded result.
+       This can take a while for big payloads, so may be run in the executor."""
+    raw = decompress(body, encoding)
+    data = json_loads(raw)
+    if fields:
+        data = select_fields(data, fields)
+    return data, len(raw)
@@ -3,18 +3,15 @@ from __future__ import annotations
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorStateClass,
-    SensorEntity
+    SensorEntity,
+    RestoreSensor
 )
 import math
 import logging
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.const import UnitOfPower, UnitOfEnergy, UnitOfElectricCurrent, UnitOfElectricPotential, PERCENTAGE
+from homeassistant.const import EntityCategory, UnitOfPower, UnitOfEnergy, UnitOfElectricCurrent, UnitOfElectricPotential, UnitOfTime, PERCENTAGE
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.entity import generate_entity_id
 from homeassistant.util.dt import (utcnow)
-from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATORS, DATA_SLOTS, COORDINATOR_CHARGESESSIONS, COORDINATOR_ADVANCED
-from .coordinator import OhmeChargeSessionsCoordinator, OhmeAdvancedSettingsCoordinator
-from .utils import next_slot, get_option, slot_list, slot_list_str
+from .utils import next_slot, slot_list_str, now_ms, ms_to_datetime, target_time_ms
 from .base import OhmeEntity
 
 _LOGGER = logging.getLogger(__name__)
@@ -25,13 +22,11 @@ async def async_setup_entry(
     async_add_entities
 ):
     """Setup sensors and configure coordinator."""
-    account_id = config_entry.data['email']
+    runtime = config_entry.runtime_data
 
-    client = hass.data[DOMAIN][account_id][DATA_CLIENT]
-    coordinators = hass.data[DOMAIN][account_id][DATA_COORDINATORS]
-
-    coordinator = coordinators[COORDINATOR_CHARGESESSIONS]
-    adv_coordinator = coordinators[COORDINATOR_ADVANCED]
+    client = runtime.client
+    coordinator = runtime.charge_sessions
+    adv_coordinator = runtime.advanced_settings
 
     sensors = [PowerDrawSensor(coordinator, hass, client),
                CurrentDrawSensor(coordinator, hass, client),
@@ -41,7 +36,20 @@ async def async_setup_entry(
                NextSlotEndSensor(coordinator, hass, client),
                NextSlotStartSensor(coordinator, hass, client),
                SlotListSensor(coordinator, hass, client),
-               BatterySOCSensor(coordinator, hass, client)]
+               BatterySOCSensor(coordinator, hass, client),
+               ForecastEnergySensor(coordinator, hass, client),
+               ProjectedSOCSensor(coordinator, hass, client),
+               ProjectedCompletionSensor(coordinator, hass, client),
+               SessionStatSensor(coordinator, hass, client, "session_average_power", "mdi:flash", "average_power",
+                                 SensorDeviceClass.POWER, UnitOfPower.WATT),
+               SessionStatSensor(coordinator, hass, client, "session_peak_power", "mdi:flash-alert", "peak_power",
+                                 SensorDeviceClass.POWER, UnitOfPower.WATT),
+               SessionStatSensor(coordinator, hass, client, "session_energy_rate", "mdi:speedometer", "energy_rate",
+                                 SensorDeviceClass.POWER, UnitOfPower.WATT),
+               SessionStatSensor(coordinator, hass, client, "session_charging_time", "mdi:timer-outline", "charging_time",
+                                 SensorDeviceClass.DURATION, UnitOfTime.SECONDS),
+               CommandLatencySensor(coordinator, hass, client),
+               ApiLatencySensor(coordinator, hass, client)]
     
     async_add_entities(sensors, update_before_add=True)
 
@@ -55,10 +63,18 @@ class PowerDrawSensor(OhmeEntity, SensorEntity):
 
     @property
     def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
         if self.coordinator.data and self.coordinator.data['power']:
-            return self.coordinator.data['power']['watt']
-        return 0
+            self._state = self.coordinator.data['power']['watt']
+        else:
+            self._state = 0
+
+        self.async_write_ha_state()
 
 
 class CurrentDrawSensor(OhmeEntity, SensorEntity):
@@ -70,10 +86,18 @@ class CurrentDrawSensor(OhmeEntity, SensorEntity):
 
     @property
     def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
         if self.coordinator.data and self.coordinator.data['power']:
-            return self.coordinator.data['power']['amp']
-        return 0
+            self._state = self.coordinator.data['power']['amp']
+        else:
+            self._state = 0
+
+        self.async_write_ha_state()
 
 
 class VoltageSensor(OhmeEntity, SensorEntity):
@@ -85,10 +109,18 @@ class VoltageSensor(OhmeEntity, SensorEntity):
 
     @property
     def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
         if self.coordinator.data and self.coordinator.data['power']:
-            return self.coordinator.data['power']['volt']
-        return None
+            self._state = self.coordinator.data['power']['volt']
+        else:
+            self._state = None
+
+        self.async_write_ha_state()
 
 
 class CTSensor(OhmeEntity, SensorEntity):
@@ -100,11 +132,18 @@ class CTSensor(OhmeEntity, SensorEntity):
 
     @property
     def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
-        return self.coordinator.data['clampAmps']
+        self._state = self.coordinator.data['clampAmps'] if self.coordinator.data else None
+
+        self.async_write_ha_state()
 
 
-class EnergyUsageSensor(OhmeEntity, SensorEntity):
+class EnergyUsageSensor(OhmeEntity, RestoreSensor):
     """Sensor for total energy usage."""
     _attr_translation_key = "energy"
     _attr_icon = "mdi:lightning-bolt-circle"
@@ -115,6 +154,12 @@ class EnergyUsageSensor(OhmeEntity, SensorEntity):
     _attr_device_class = SensorDeviceClass.ENERGY
     _attr_state_class = SensorStateClass.TOTAL_INCREASING
 
+    async def _async_restore_state(self) -> None:
+        """Restore the last reading so the guard against it dropping survives a restart."""
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            self._state = float(last.native_value)
+
     @callback
     def _handle_coordinator_update(self) -> None:
         # Ensure we have data, then ensure value is going up and above 0
@@ -163,7 +208,7 @@ class NextSlotStartSensor(OhmeEntity, SensorEntity):
         if self.coordinator.data is None or self.coordinator.data["mode"] == "DISCONNECTED":
             self._state = None
         else:
-            self._state = next_slot(self._hass, self._client.email, self.coordinator.data)['start']
+            self._state = next_slot(self._options, self.coordinator.slot_index())['start']
 
         self._last_updated = utcnow()
 
@@ -187,7 +232,7 @@ class NextSlotEndSensor(OhmeEntity, SensorEntity):
         if self.coordinator.data is None or self.coordinator.data["mode"] == "DISCONNECTED":
             self._state = None
         else:
-            self._state = next_slot(self._hass, self._client.email, self.coordinator.data)['end']
+            self._state = next_slot(self._options, self.coordinator.slot_index())['end']
 
         self._last_updated = utcnow()
 
@@ -210,18 +255,174 @@ class SlotListSensor(OhmeEntity, SensorEntity):
         if self.coordinator.data is None or self.coordinator.data["mode"] == "DISCONNECTED" or self.coordinator.data["mode"] == "FINISHED_CHARGE":
             self._state = None
         else:
-            slots = slot_list(self.coordinator.data)
-            
-            # Store slots for external use
-            self._hass.data[DOMAIN][self._client.email][DATA_SLOTS] = slots
-
             # Convert list to text
-            self._state = slot_list_str(self._hass, self._client.email, slots)
+            self._state = slot_list_str(self._options, self.coordinator.slot_index())
             
         self._last_updated = utcnow()
         self.async_write_ha_state()
 
 
+class ForecastEnergySensor(OhmeEntity, SensorEntity):
+    """Sensor for energy the charge plan still expects to add."""
+    _attr_translation_key = "forecast_energy"
+    _attr_icon = "mdi:battery-plus-outline"
+    _attr_native_unit_of_measurement = UnitOfEnergy.WATT_HOUR
+    _attr_suggested_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    _attr_suggested_display_precision = 1
+    _attr_device_class = SensorDeviceClass.ENERGY
+
+    @property
+    def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Read remaining energy from the forecast table built for this payload."""
+        if self.coordinator.data is None or self.coordinator.data["mode"] == "DISCONNECTED":
+            self._state = None
+        else:
+            self._state = self.coordinator.forecast().energy_remaining(now_ms())
+
+        self._last_updated = utcnow()
+
+        self.async_write_ha_state()
+
+
+class ProjectedSOCSensor(OhmeEntity, SensorEntity):
+    """Sensor for the SoC the charge plan expects at the target time."""
+    _attr_translation_key = "projected_soc"
+    _attr_icon = "mdi:battery-clock"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_device_class = SensorDeviceClass.BATTERY
+    _attr_suggested_display_precision = 0
+
+    @property
+    def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Interpolate SoC at the target time from the forecast table."""
+        target = target_time_ms(self.coordinator.data)
+        if self.coordinator.data is None or self.coordinator.data["mode"] == "DISCONNECTED" or target is None:
+            self._state = None
+        else:
+            self._state = self.coordinator.forecast().percent_at(target)
+
+        self._last_updated = utcnow()
+
+        self.async_write_ha_state()
+
+
+class ProjectedCompletionSensor(OhmeEntity, SensorEntity):
+    """Sensor for when the charge plan expects to finish adding charge."""
+    _attr_translation_key = "projected_completion"
+    _attr_icon = "mdi:battery-check"
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+
+    @property
+    def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Read completion time from the forecast table."""
+        completion = None
+        if self.coordinator.data is not None and self.coordinator.data["mode"] != "DISCONNECTED":
+            completion = self.coordinator.forecast().completion()
+
+        self._state = None if completion is None else ms_to_datetime(completion)
+        self._last_updated = utcnow()
+
+        self.async_write_ha_state()
+
+
+class SessionStatSensor(OhmeEntity, SensorEntity):
+    """Sensor for a rolling statistic of the current charge session."""
+    _attr_suggested_display_precision = 0
+
+    def __init__(self, coordinator, hass: HomeAssistant, client, translation_key, icon, stat, device_class, unit):
+        self._attr_translation_key = translation_key
+        self._attr_icon = icon
+        self._attr_device_class = device_class
+        self._attr_native_unit_of_measurement = unit
+        self._stat = stat
+
+        super().__init__(coordinator, hass, client)
+
+    @property
+    def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Read the statistic the coordinator folded in for this payload."""
+        self._state = getattr(self.coordinator.session_stats, self._stat)
+        self._last_updated = utcnow()
+
+        self.async_write_ha_state()
+
+
+class CommandLatencySensor(OhmeEntity, SensorEntity):
+    """Diagnostic sensor for the charger's command queue."""
+    _attr_translation_key = "command_latency"
+    _attr_icon = "mdi:timer-sync-outline"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_suggested_display_precision = 0
+
+    @property
+    def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Commands are followed by a refresh, so this runs after each one."""
+        commands = self._client.commands
+        self._state = commands.average_latency
+        self._attr_extra_state_attributes = {
+            "queue_depth": commands.depth,
+            "last_latency": commands.last_latency,
+            "completed": commands.completed,
+            "superseded": commands.superseded,
+            "skipped_writes": self._client.skipped_writes
+        }
+
+        self.async_write_ha_state()
+
+
+class ApiLatencySensor(OhmeEntity, SensorEntity):
+    """Diagnostic sensor for charge session request tail latency."""
+    _attr_translation_key = "api_latency"
+    _attr_icon = "mdi:timer-sand"
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_suggested_display_precision = 0
+
+    @property
+    def native_value(self):
+        """Return pre-calculated state."""
+        return self._state
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """p95 of charge session requests, with the rest of the figures as attributes."""
+        tracker = self._client.latency.get("charge_sessions")
+        summary = tracker.summary() if tracker else {}
+
+        self._state = summary.get("p95")
+        self._attr_extra_state_attributes = summary
+
+        self.async_write_ha_state()
+
+
 class BatterySOCSensor(OhmeEntity, SensorEntity):
     """Sensor for car battery SOC."""
     _attr_translation_key = "battery_soc"
@@ -229,8 +430,9 @@ class BatterySOCSensor(OhmeEntity, SensorEntity):
     _attr_device_class = SensorDeviceClass.BATTERY
     _attr_suggested_display_precision = 0
 
-    @property
-    def icon(self):
+    _attr_icon = "mdi:battery-outline"
+
+    def _battery_icon(self):
         """Icon of the sensor. Round up to the nearest 10% icon."""
         nearest = math.ceil((self._state or 0) / 10.0) * 10
         if nearest == 0:
@@ -250,6 +452,7 @@ class BatterySOCSensor(OhmeEntity, SensorEntity):
             if isinstance(self._state, int) and self._state < 0:
                 self._state = 0
 
+            self._attr_icon = self._battery_icon()
             self._last_updated = utcnow()
             self.async_write_ha_state()
 
@@ -0,0 +1,166 @@
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+from homeassistant.config_entries import ConfigEntryState
+from .const import DOMAIN
+from .utils import get_option, now_ms, in_slot, target_time_ms
+
+SERVICE_GET_SESSIONS = "get_sessions"
+SERVICE_GET_PLAN = "get_plan"
+SERVICE_SET_SETTINGS = "set_settings"
+
+ATTR_CONFIG_ENTRY = "config_entry"
+ATTR_START = "start"
+ATTR_END = "end"
+
+GET_SESSIONS_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY): str,
+    vol.Required(ATTR_START): cv.datetime,
+    vol.Required(ATTR_END): cv.datetime
+})
+
+GET_PLAN_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY): str
+})
+
+# Service field: (capability, app setting, value when on, value when off)
+SETTINGS_FIELDS = {
+    "lock_buttons": ("buttonsLockable", "buttonsLocked", True, False),
+    "require_approval": ("pluginsRequireApprovalMode", "pluginsRequireApproval", True, False),
+    "sleep_when_inactive": ("stealth", "stealthEnabled", True, False),
+    "solar_boost": (None, "solarMode", "ZERO_EXPORT", "IGNORE")
+}
+
+SET_SETTINGS_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Optional(ATTR_CONFIG_ENTRY): str,
+        **{vol.Optional(field): cv.boolean for field in SETTINGS_FIELDS}
+    }),
+    cv.has_at_least_one_key(*SETTINGS_FIELDS)
+)
+
+
+def _get_runtime(hass, call):
+    """Find the account a service call is for. Defaults to the only configured account."""
+    entries = hass.config_entries.async_entries(DOMAIN)
+    if ATTR_CONFIG_ENTRY in call.data:
+        entries = [entry for entry in entries if entry.entry_id == call.data[ATTR_CONFIG_ENTRY]]
+    elif len(entries) > 1:
+        raise ServiceValidationError("Multiple Ohme accounts configured, please specify a config entry")
+
+    if not entries or entries[0].state is not ConfigEntryState.LOADED:
+        raise ServiceValidationError("Ohme account not found or not loaded")
+
+    return entries[0].runtime_data
+
+
+def settings_values(client, data):
+    """App settings for the fields of a set_settings call, checking the charger supports them."""
+    values = {}
+    for field, (capability, key, on, off) in SETTINGS_FIELDS.items():
+        if field not in data:
+            continue
+
+        supported = client.solar_capable() if capability is None else client.is_capable(capability)
+        if not supported:
+            raise ServiceValidationError(f"This charger does not support {field}")
+
+        values[key] = on if data[field] else off
+
+    return values
+
+
+def _to_ms(value):
+    """Datetime to epoch ms, treating naive values as local time."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=dt_util.DEFAULT_TIME_ZONE)
+    return int(value.timestamp() * 1000)
+
+
+def _ms_to_iso(ms):
+    return None if ms is None else dt_util.as_local(dt_util.utc_from_timestamp(ms / 1000)).isoformat()
+
+
+def build_plan(options, coordinator, now):
+    """Snapshot of the current slot plan and charge state, from the cached slot data."""
+    data = coordinator.data
+    if not data or data['mode'] == "DISCONNECTED":
+        return {"mode": data['mode'] if data else None, "slot_active": False, "slots": []}
+
+    collapse = not get_option(options, "never_collapse_slots", False)
+    index = coordinator.slot_index()
+    forecast = coordinator.forecast()
+    starts, ends = index.view(collapse)
+
+    target = target_time_ms(data)
+    rule = data.get('appliedRule') or {}
+    soc = (data.get('car') or {}).get('batterySoc') or data.get('batterySoc') or {}
+
+    return {
+        "mode": data['mode'],
+        "slot_active": in_slot(index, now),
+        "next_slot_start": _ms_to_iso(index.next_start(now, collapsed=collapse)),
+        "next_slot_end": _ms_to_iso(index.next_end(now, collapsed=collapse)),
+        "slots": [{"start": _ms_to_iso(start), "end": _ms_to_iso(end)} for start, end in zip(starts, ends)],
+        "battery_soc": soc.get('percent'),
+        "target_percent": rule.get('targetPercent'),
+        "target_time": _ms_to_iso(target),
+        "energy_remaining_wh": forecast.energy_remaining(now),
+        "projected_soc": None if target is None else forecast.percent_at(target),
+        "projected_completion": _ms_to_iso(forecast.completion())
+    }
+
+
+async def async_setup_services(hass: HomeAssistant):
+    """Register integration services."""
+
+    async def async_get_sessions(call: ServiceCall):
+        """Aggregate archived charge sessions over a date range."""
+        runtime = _get_runtime(hass, call)
+
+        result = await hass.async_add_executor_job(
+            runtime.charge_sessions.archive.aggregate, _to_ms(call.data[ATTR_START]), _to_ms(call.data[ATTR_END])
+        )
+
+        result['first_start'] = _ms_to_iso(result.pop('first_start_ms'))
+        result['last_end'] = _ms_to_iso(result.pop('last_end_ms'))
+        return result
+
+    async def async_get_plan(call: ServiceCall):
+        """Return the full current charge plan in one consistent snapshot."""
+        runtime = _get_runtime(hass, call)
+
+        return build_plan(runtime.options, runtime.charge_sessions, now_ms())
+
+    async def async_set_settings(call: ServiceCall):
+        """Change several charger settings in one request."""
+        runtime = _get_runtime(hass, call)
+
+        changed = await runtime.client.async_set_configuration_value(settings_values(runtime.client, call.data))
+        if changed and runtime.account_info is not None:
+            await runtime.account_info.async_refresh_after_command()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_PLAN,
+        async_get_plan,
+        schema=GET_PLAN_SCHEMA,
+        supports_response=SupportsResponse.ONLY
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_SESSIONS,
+        async_get_sessions,
+        schema=GET_SESSIONS_SCHEMA,
+        supports_response=SupportsResponse.ONLY
+    )
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_SETTINGS,
+        async_set_settings,
+        schema=SET_SETTINGS_SCHEMA
+    )
@@ -0,0 +1,126 @@
+from collections import deque
+from .const import SESSION_BUFFER_SIZE
+from .utils import now_ms
+# import logging
+# _LOGGER = logging.getLogger(__name__)
+
+
+def graph_time_ms(x):
+    """Normalise a chargeGraph x value to epoch milliseconds."""
+    # Values below this are epoch seconds rather than milliseconds
+    return int(x * 1000) if x < 100000000000 else int(x)
+
+
+class SessionStats:
+    """Rolling statistics for the current charge session.
+       Each payload is folded in with O(1) work (plus any new chargeGraph points),
+       so nothing is recomputed from the full graph on every poll."""
+
+    def __init__(self, maxlen=SESSION_BUFFER_SIZE):
+        self.points = deque(maxlen=maxlen)    # (epoch ms, Wh) from chargeGraph
+        self.readings = deque(maxlen=maxlen)  # (epoch ms, W) from power readings
+        self.reset()
+
+    def reset(self):
+        """Clear all state ready for a new session."""
+        self.points.clear()
+        self.readings.clear()
+        self.peak_power = None
+        self.charging_ms = 0
+        self._energy_integral = 0  # W.ms while charging
+        self._last_x = None
+        self._last_wh = None
+
+    def update(self, data, now=None):
+        """Fold a charge session payload into the statistics."""
+        if not data or data['mode'] == "DISCONNECTED":
+            if self.readings or self.points:
+                self.reset()
+            return
+
+        now = now_ms() if now is None else now
+        self._fold_graph(data.get('chargeGraph'))
+        self._fold_power(data['power']['watt'] if data.get('power') else 0, now)
+
+    def _fold_graph(self, graph):
+        """Append any chargeGraph points newer than the last one seen."""
+        if not graph:
+            return
+
+        points = graph.get('points') or []
+
+        # Walk back from the end until we reach points we've already got
+        new = []
+        for point in reversed(points):
+            if self._last_x is not None and point['x'] <= self._last_x:
+                break
+            new.append(point)
+
+        if graph.get('now') and graph['now'].get('x') is not None and (self._last_x is None or graph['now']['x'] > self._last_x):
+            if not new or graph['now']['x'] > new[0]['x']:
+                new.insert(0, graph['now'])
+
+        for point in reversed(new):
+            # Energy going backwards means a new session has started
+            if self._last_wh is not None and point['y'] < self._last_wh:
+                self.reset()
+
+            self.points.append((graph_time_ms(point['x']), point['y']))
+            self._last_x = point['x']
+            self._last_wh = point['y']
+
+    def _fold_power(self, watts, now):
+        """Integrate the previous power reading up to now and store this one."""
+        if self.readings:
+            last_ts, last_watts = self.readings[-1]
+            if last_watts > 0 and now > last_ts:
+                self.charging_ms += now - last_ts
+                self._energy_integral += last_watts * (now - last_ts)
+
+        if watts > 0:
+            self.peak_power = watts if self.peak_power is None else max(self.peak_power, watts)
+
+        self.readings.append((now, watts))
+
+    @property
+    def average_power(self):
+        """Time weighted average power (W) while charging."""
+        if not self.charging_ms:
+            return None
+        return self._energy_integral / self.charging_ms
+
+    @property
+    def energy_rate(self):
+        """Rate of energy added (Wh per hour) across the points in the buffer."""
+        if len(self.points) < 2:
+            return None
+
+        (t0, wh0), (t1, wh1) = self.points[0], self.points[-1]
+        if t1 <= t0:
+            return None
+        return (wh1 - wh0) / ((t1 - t0) / 3600000)
+
+    @property
+    def charging_time(self):
+        """Seconds spent drawing power this session."""
+        return self.charging_ms // 1000
+
+
+def hourly_energy(points, until_ms):
+    """Bucket cumulative (epoch ms, Wh) points into complete hours before until_ms.
+       Returns a list of (hour start ms, cumulative Wh at the end of that hour)."""
+    hours = []
+    for ts, wh in points:
+        hour = ts - ts % 3600000
+        if hour + 3600000 > until_ms:
+            break
+
+        if hours and hours[-1][0] == hour:
+            hours[-1] = (hour, wh)
+        else:
+            # Carry the total across any hours with no points
+            while hours and hours[-1][0] + 3600000 < hour:
+                hours.append((hours[-1][0] + 3600000, hours[-1][1]))
+            hours.append((hour, wh))
+
+    return hours
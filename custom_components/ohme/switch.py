@@ -1,17 +1,11 @@
 from __future__ import annotations
 import logging
-import asyncio
 
 from homeassistant.core import callback, HomeAssistant
-from homeassistant.helpers.entity import generate_entity_id
 
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity
-)
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.util.dt import (utcnow)
 
-from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATORS, COORDINATOR_CHARGESESSIONS, COORDINATOR_ACCOUNTINFO
 from .base import OhmeEntity
 
 _LOGGER = logging.getLogger(__name__)
@@ -23,13 +17,11 @@ async def async_setup_entry(
     async_add_entities
 ):
     """Setup switches and configure coordinator."""
-    account_id = config_entry.data['email']
+    runtime = config_entry.runtime_data
 
-    coordinators = hass.data[DOMAIN][account_id][DATA_COORDINATORS]
-
-    coordinator = coordinators[COORDINATOR_CHARGESESSIONS]
-    accountinfo_coordinator = coordinators[COORDINATOR_ACCOUNTINFO]
-    client = hass.data[DOMAIN][account_id][DATA_CLIENT]
+    coordinator = runtime.charge_sessions
+    accountinfo_coordinator = runtime.account_info
+    client = runtime.client
 
     switches = [OhmePauseChargeSwitch(coordinator, hass, client),
                 OhmeMaxChargeSwitch(coordinator, hass, client)
@@ -86,15 +78,13 @@ class OhmePauseChargeSwitch(OhmeEntity, SwitchEntity):
         """Turn on the switch."""
         await self._client.async_pause_charge()
 
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_refresh_after_command()
 
     async def async_turn_off(self):
         """Turn off the switch."""
         await self._client.async_resume_charge()
 
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_refresh_after_command()
 
 
 class OhmeMaxChargeSwitch(OhmeEntity, SwitchEntity):
@@ -119,18 +109,16 @@ class OhmeMaxChargeSwitch(OhmeEntity, SwitchEntity):
         """Turn on the switch."""
         await self._client.async_max_charge(True)
 
-        # Not very graceful but wait here to avoid the mode coming back as 'CALCULATING'
+        # Not very graceful but the refresh waits a second to avoid the mode coming back as 'CALCULATING'
         # It would be nice to simply ignore this state in future and try again after x seconds.
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_refresh_after_command()
 
     async def async_turn_off(self):
         """Stop max charging.
            We are not changing anything, just applying the last rule. No need to supply anything."""
         await self._client.async_max_charge(False)
 
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        await self.coordinator.async_refresh_after_command()
 
 
 class OhmeConfigurationSwitch(OhmeEntity, SwitchEntity):
@@ -159,17 +147,13 @@ class OhmeConfigurationSwitch(OhmeEntity, SwitchEntity):
 
     async def async_turn_on(self):
         """Turn on the switch."""
-        await self._client.async_set_configuration_value({self._config_key: True})
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        if await self._client.async_set_configuration_value({self._config_key: True}):
+            await self.coordinator.async_refresh_after_command()
 
     async def async_turn_off(self):
         """Turn off the switch."""
-        await self._client.async_set_configuration_value({self._config_key: False})
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        if await self._client.async_set_configuration_value({self._config_key: False}):
+            await self.coordinator.async_refresh_after_command()
 
 
 class OhmeSolarBoostSwitch(OhmeEntity, SwitchEntity):
@@ -193,17 +177,13 @@ class OhmeSolarBoostSwitch(OhmeEntity, SwitchEntity):
 
     async def async_turn_on(self):
         """Turn on the switch."""
-        await self._client.async_set_configuration_value({"solarMode": "ZERO_EXPORT"})
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        if await self._client.async_set_configuration_value({"solarMode": "ZERO_EXPORT"}):
+            await self.coordinator.async_refresh_after_command()
 
     async def async_turn_off(self):
         """Turn off the switch."""
-        await self._client.async_set_configuration_value({"solarMode": "IGNORE"})
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        if await self._client.async_set_configuration_value({"solarMode": "IGNORE"}):
+            await self.coordinator.async_refresh_after_command()
 
 
 class OhmePriceCapSwitch(OhmeEntity, SwitchEntity):
@@ -226,14 +206,10 @@ class OhmePriceCapSwitch(OhmeEntity, SwitchEntity):
 
     async def async_turn_on(self):
         """Turn on the switch."""
-        await self._client.async_change_price_cap(enabled=True)
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        if await self._client.async_change_price_cap(enabled=True):
+            await self.coordinator.async_refresh_after_command()
 
     async def async_turn_off(self):
         """Turn off the switch."""
-        await self._client.async_change_price_cap(enabled=False)
-
-        await asyncio.sleep(1)
-        await self.coordinator.async_refresh()
+        if await self._client.async_change_price_cap(enabled=False):
+            await self.coordinator.async_refresh_after_command()
@@ -1,10 +1,7 @@
 from __future__ import annotations
-import asyncio
 import logging
 from homeassistant.components.time import TimeEntity
-from homeassistant.helpers.entity import generate_entity_id
 from homeassistant.core import callback, HomeAssistant
-from .const import DOMAIN, DATA_CLIENT, DATA_COORDINATORS, COORDINATOR_CHARGESESSIONS, COORDINATOR_SCHEDULES
 from .utils import session_in_progress
 from datetime import time as dt_time
 from .base import OhmeEntity
@@ -18,13 +15,10 @@ async def async_setup_entry(
     async_add_entities
 ):
     """Setup switches and configure coordinator."""
-    account_id = config_entry.data['email']
+    runtime = config_entry.runtime_data
 
-    coordinators = hass.data[DOMAIN][account_id][DATA_COORDINATORS]
-    client = hass.data[DOMAIN][account_id][DATA_CLIENT]
-
-    numbers = [TargetTime(coordinators[COORDINATOR_CHARGESESSIONS],
-                          coordinators[COORDINATOR_SCHEDULES], hass, client)]
+    numbers = [TargetTime(runtime.charge_sessions,
+                          runtime.charge_schedules, hass, runtime.client)]
 
     async_add_entities(numbers, update_before_add=True)
 
@@ -52,21 +46,19 @@ class TargetTime(OhmeEntity, TimeEntity):
     async def async_set_value(self, value: dt_time) -> None:
         """Update the current value."""
         # If session in progress, update this session, if not update the first schedule
-        if session_in_progress(self.hass, self._client.email, self.coordinator.data):
-            await self._client.async_apply_session_rule(target_time=(int(value.hour), int(value.minute)))
-            await asyncio.sleep(1)
-            await self.coordinator.async_refresh()
+        if session_in_progress(self._options, self.coordinator.data):
+            if await self._client.async_apply_session_rule(target_time=(int(value.hour), int(value.minute))):
+                await self.coordinator.async_refresh_after_command()
         else:
-            await self._client.async_update_schedule(target_time=(int(value.hour), int(value.minute)))
-            await asyncio.sleep(1)
-            await self.coordinator_schedules.async_refresh()
+            if await self._client.async_update_schedule(target_time=(int(value.hour), int(value.minute))):
+                await self.coordinator_schedules.async_refresh_after_command()
 
     @callback
     def _handle_coordinator_update(self) -> None:
         """Get value from data returned from API by coordinator"""
         # Read with the same logic as setting
         target = None
-        if session_in_progress(self.hass, self._client.email, self.coordinator.data):
+        if session_in_progress(self._options, self.coordinator.data):
             target = self.coordinator.data['appliedRule']['targetTime']
         elif self.coordinator_schedules.data:
             target = self.coordinator_schedules.data['targetTime']
@@ -0,0 +1,93 @@
+from .utils import in_slot, ms_to_datetime
+
+EVENT_PLUGGED_IN = "ohme_plugged_in"
+EVENT_APPROVAL_REQUIRED = "ohme_approval_required"
+EVENT_SLOT_STARTED = "ohme_slot_started"
+EVENT_SLOT_ENDED = "ohme_slot_ended"
+EVENT_TARGET_REACHED = "ohme_target_reached"
+EVENT_CHARGE_FINISHED = "ohme_charge_finished"
+
+# Modes where no car is plugged in
+UNPLUGGED_MODES = ("DISCONNECTED",)
+
+
+def session_transitions(previous, data):
+    """Names of the charge state transitions between two charge session payloads.
+       Nothing is reported for the first payload, as there is nothing to compare against."""
+    if not previous or not data:
+        return set()
+
+    before, after = previous['mode'], data['mode']
+    if before == after:
+        return set()
+
+    transitions = set()
+    if before in UNPLUGGED_MODES:
+        transitions.add("plugged_in")
+    elif after in UNPLUGGED_MODES:
+        transitions.add("unplugged")
+
+    if before == "PENDING_APPROVAL" and after not in UNPLUGGED_MODES:
+        transitions.add("approved")
+
+    if after == "FINISHED_CHARGE":
+        transitions.add("finished")
+
+    return transitions
+
+
+def battery_soc(data):
+    """Battery percentage from the car if it's API connected, otherwise Ohme's estimate."""
+    car = (data.get('car') or {}).get('batterySoc') or {}
+    return car.get('percent') or (data.get('batterySoc') or {}).get('percent')
+
+
+class SessionEvents:
+    """Diff consecutive charge session payloads into typed events for the event bus.
+       Slot activity depends on the time as well as the payload, so the last state is kept."""
+
+    def __init__(self):
+        self._slot_active = None
+
+    def update(self, previous, data, index, now):
+        """Return a list of (event type, event data) for this payload."""
+        if not data:
+            return []
+
+        slot_active = data['mode'] not in UNPLUGGED_MODES and in_slot(index, now)
+        was_active, self._slot_active = self._slot_active, slot_active
+
+        # Nothing to compare against, eg. after a restart
+        if not previous or was_active is None:
+            return []
+
+        events = []
+        transitions = session_transitions(previous, data)
+        event_data = {"mode": data['mode']}
+
+        if "plugged_in" in transitions:
+            events.append((EVENT_PLUGGED_IN, event_data))
+
+        if data['mode'] == "PENDING_APPROVAL" and previous['mode'] != "PENDING_APPROVAL":
+            events.append((EVENT_APPROVAL_REQUIRED, event_data))
+
+        if slot_active and not was_active:
+            start, end = index.current(now, collapsed=True)
+            events.append((EVENT_SLOT_STARTED, {
+                **event_data,
+                "start": ms_to_datetime(start).isoformat(),
+                "end": ms_to_datetime(end).isoformat()
+            }))
+        elif was_active and not slot_active:
+            events.append((EVENT_SLOT_ENDED, event_data))
+
+        # Only fire when the target is crossed, not every time it's checked
+        target = (data.get('appliedRule') or {}).get('targetPercent')
+        soc, soc_before = battery_soc(data), battery_soc(previous)
+        if target and soc is not None and soc_before is not None and soc_before < target <= soc:
+            events.append((EVENT_TARGET_REACHED, {**event_data, "battery_soc": soc, "target_percent": target}))
+
+        if "finished" in transitions:
+            events.append((EVENT_CHARGE_FINISHED, {**event_data, "battery_soc": soc}))
+
+        return events
@@ -1,104 +1,321 @@
-from functools import reduce
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
-from .const import DOMAIN, DATA_OPTIONS
-import pytz
+from contextlib import contextmanager
+from time import time, localtime, strftime, perf_counter
 # import logging
 # _LOGGER = logging.getLogger(__name__)
 
 
-def next_slot(hass, account_id, data):
-    """Get the next charge slot start/end times."""
-    slots = slot_list(data)
-    collapse_slots = not get_option(hass, account_id, "never_collapse_slots", False)
+def now_ms():
+    """Current time in epoch milliseconds, as used by the slot index."""
+    return int(time() * 1000)
+
 
-    start = None
-    end = None
+def ms_to_datetime(ms):
+    """Convert epoch milliseconds to a local timezone-aware datetime, to the second."""
+    return datetime.fromtimestamp(ms // 1000).astimezone()
 
-    # Loop through slots
-    for slot in slots:
-        # Only take the first slot start/end that matches. These are in order.
-        if end is None and slot['end'] > datetime.now().astimezone():
-            end = slot['end']
 
-        if start is None and slot['start'] > datetime.now().astimezone():
-            start = slot['start']
-        elif collapse_slots and slot['start'] == end:
-            end = slot['end']
-        elif start is not None and end is not None:
-            break
+def next_slot(options, index, now=None):
+    """Get the next charge slot start/end times."""
+    collapse_slots = not get_option(options, "never_collapse_slots", False)
+    now = now_ms() if now is None else now
+
+    start = index.next_start(now, collapsed=collapse_slots)
+    end = index.next_end(now, collapsed=collapse_slots)
 
     return {
-        "start": start,
-        "end": end
+        "start": None if start is None else ms_to_datetime(start),
+        "end": None if end is None else ms_to_datetime(end)
     }
 
 
 def slot_list(data):
     """Get list of charge slots."""
-    session_slots = data['allSessionSlots']
-    if session_slots is None or len(session_slots) == 0:
-        return []
-    
-    slots = []
-    wh_tally = 0
-    
-    if 'batterySocBefore' in data and data['batterySocBefore'] is not None and data['batterySocBefore']['wh'] is not None:
-        wh_tally = data['batterySocBefore']['wh'] # Get the wh value we start from
-
-    for slot in session_slots:
-        slots.append(
-            {
-                "start": datetime.utcfromtimestamp(slot['startTimeMs'] / 1000).replace(tzinfo=pytz.utc, microsecond=0).astimezone(),
-                "end": datetime.utcfromtimestamp(slot['endTimeMs'] / 1000).replace(tzinfo=pytz.utc, microsecond=0).astimezone(),
-                "charge_in_kwh": -((slot['estimatedSoc']['wh'] - wh_tally) / 1000), # Work out how much we add in just this slot
+    return SlotIndex.from_session(data).slot_list()
+
+
+class SlotIndex:
+    """Sorted interval index over charge slots.
+       Slots are held as parallel arrays of integer epoch milliseconds and
+       float estimated Wh, with the collapsed view (adjacent slots merged)
+       precomputed alongside. Datetimes are only built when asked for."""
+
+    __slots__ = ("starts", "ends", "wh", "wh_before", "collapsed_starts", "collapsed_ends")
+
+    def __init__(self, starts=(), ends=(), wh=(), wh_before=0):
+        self.starts = array('q', starts)
+        self.ends = array('q', ends)
+        self.wh = array('d', wh)
+        self.wh_before = wh_before
+
+        # Merge slots where one ends exactly as the next begins
+        self.collapsed_starts = array('q')
+        self.collapsed_ends = array('q')
+        for start, end in zip(self.starts, self.ends):
+            if self.collapsed_ends and self.collapsed_ends[-1] == start:
+                self.collapsed_ends[-1] = end
+            else:
+                self.collapsed_starts.append(start)
+                self.collapsed_ends.append(end)
+
+    @classmethod
+    def from_session(cls, data):
+        """Decode allSessionSlots from a charge session payload."""
+        session_slots = data.get('allSessionSlots') if data else None
+        if not session_slots:
+            return cls()
+
+        wh_before = 0
+        if data.get('batterySocBefore') and data['batterySocBefore']['wh'] is not None:
+            wh_before = data['batterySocBefore']['wh'] # Get the wh value we start from
+
+        return cls(
+            [slot['startTimeMs'] for slot in session_slots],
+            [slot['endTimeMs'] for slot in session_slots],
+            [slot['estimatedSoc']['wh'] for slot in session_slots],
+            wh_before
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def view(self, collapsed=False):
+        """Return (starts, ends) arrays for the collapsed or uncollapsed view."""
+        if collapsed:
+            return self.collapsed_starts, self.collapsed_ends
+        return self.starts, self.ends
+
+    def current(self, now, collapsed=False):
+        """Return (start, end) of the slot containing now, or None."""
+        starts, ends = self.view(collapsed)
+
+        # Last slot starting strictly before now. Slots don't overlap so ends are sorted too.
+        i = bisect_left(starts, now) - 1
+        if i >= 0 and ends[i] > now:
+            return starts[i], ends[i]
+        return None
+
+    def next_start(self, now, collapsed=False):
+        """Start of the first slot beginning after now."""
+        starts, _ = self.view(collapsed)
+        i = bisect_right(starts, now)
+        return starts[i] if i < len(starts) else None
+
+    def next_end(self, now, collapsed=False):
+        """End of the first slot finishing after now."""
+        _, ends = self.view(collapsed)
+        i = bisect_right(ends, now)
+        return ends[i] if i < len(ends) else None
+
+    def upcoming(self, now, collapsed=False):
+        """Return (start, end) of the slot in progress or, failing that, the next one."""
+        starts, ends = self.view(collapsed)
+        i = bisect_right(ends, now)
+        return (starts[i], ends[i]) if i < len(starts) else None
+
+    def in_range(self, start, end, collapsed=False):
+        """List of (start, end) for slots overlapping the range start to end."""
+        starts, ends = self.view(collapsed)
+        first = bisect_right(ends, start)
+        last = bisect_left(starts, end)
+        return list(zip(starts[first:last], ends[first:last]))
+
+    def completed_count(self, now):
+        """Number of slots that finished before now."""
+        return bisect_left(self.ends, now)
+
+    def dispatches(self, now):
+        """Split slots into (planned, completed) dispatch dicts, as used by Octopus Energy.
+           Times are ISO strings so the attributes are cheap to serialise."""
+        planned = []
+        completed = []
+        done = self.completed_count(now)
+        upcoming = bisect_right(self.ends, now)
+        wh_tally = self.wh_before
+
+        for i, (start, end, wh) in enumerate(zip(self.starts, self.ends, self.wh)):
+            dispatch = {
+                "start": ms_to_datetime(start).isoformat(),
+                "end": ms_to_datetime(end).isoformat(),
+                "charge_in_kwh": -((wh - wh_tally) / 1000),
                 "source": "smart-charge",
                 "location": None
             }
-        )
-        
-        wh_tally = slot['estimatedSoc']['wh']
+            if i < done:
+                completed.append(dispatch)
+            elif i >= upcoming:
+                planned.append(dispatch)
+
+            wh_tally = wh
+
+        return planned, completed
+
+    def slot_list(self):
+        """Expand the index into the list of slot dicts exposed by entities."""
+        slots = []
+        wh_tally = self.wh_before
+
+        for start, end, wh in zip(self.starts, self.ends, self.wh):
+            slots.append(
+                {
+                    "start": ms_to_datetime(start),
+                    "end": ms_to_datetime(end),
+                    "charge_in_kwh": -((wh - wh_tally) / 1000), # Work out how much we add in just this slot
+                    "source": "smart-charge",
+                    "location": None
+                }
+            )
+
+            wh_tally = wh
+
+        return slots
 
-    return slots
 
+class ChargeForecast:
+    """Piecewise-linear interpolation table of estimated Wh and SoC over the slot plan.
+       Charge is assumed to accrue linearly within a slot and not at all between slots."""
 
-def slot_list_str(hass, account_id, slots):
-        """Convert slot list to string."""
+    __slots__ = ("times", "wh", "percent")
 
-        # Convert list to tuples of times
-        t_slots = []
-        for slot in slots:
-            t_slots.append((slot['start'].strftime('%H:%M'), slot['end'].strftime('%H:%M')))
+    def __init__(self, index=None, percent_before=None, percents=()):
+        self.times = array('q')
+        self.wh = array('d')
+        self.percent = array('d') if percents and percent_before is not None else None
 
-        state = []
+        if index is None:
+            return
 
-        if not get_option(hass, account_id, "never_collapse_slots", False):
-            # Collapse slots so consecutive slots become one
-            for i in range(len(t_slots)):
-                if not state or state[-1][1] != t_slots[i][0]:
-                    state.append(t_slots[i])
-                else:
-                    state[-1] = (state[-1][0], t_slots[i][1])
-        else:
-            state = t_slots
-            
-        # Convert list of tuples to string
-        state = reduce(lambda acc, slot: acc + f"{slot[0]}-{slot[1]}, ", state, "")[:-2]
+        wh_tally = index.wh_before
+        pc_tally = percent_before
+        for i, (start, end, wh) in enumerate(zip(index.starts, index.ends, index.wh)):
+            self.times.extend((start, end))
+            self.wh.extend((wh_tally, wh))
+            if self.percent is not None:
+                self.percent.extend((pc_tally, percents[i]))
+                pc_tally = percents[i]
+            wh_tally = wh
 
-        # Make sure we return None/Unknown if the list is empty
-        return None if state == "" else state
+    @classmethod
+    def from_session(cls, data, index):
+        """Build the table from a payload and its already decoded slot index."""
+        if not len(index):
+            return cls()
 
+        percent_before = (data.get('batterySocBefore') or {}).get('percent')
+        percents = [slot['estimatedSoc'].get('percent') for slot in data['allSessionSlots']]
+        if None in percents:
+            percents = ()
 
-def in_slot(data):
+        return cls(index, percent_before, percents)
+
+    def _interpolate(self, column, at):
+        if not self.times:
+            return None
+
+        i = bisect_right(self.times, at)
+        if i == 0:
+            return column[0]
+        if i == len(self.times):
+            return column[-1]
+
+        t0, t1 = self.times[i - 1], self.times[i]
+        if t1 == t0:
+            return column[i]
+        return column[i - 1] + (column[i] - column[i - 1]) * (at - t0) / (t1 - t0)
+
+    def wh_at(self, at):
+        """Estimated battery Wh at a time in epoch ms."""
+        return self._interpolate(self.wh, at)
+
+    def percent_at(self, at):
+        """Estimated SoC percentage at a time in epoch ms."""
+        if self.percent is None:
+            return None
+        return self._interpolate(self.percent, at)
+
+    def energy_remaining(self, now):
+        """Wh still to be added by the plan after now."""
+        if not self.times:
+            return None
+        return max(0, self.wh[-1] - self.wh_at(now))
+
+    def completion(self):
+        """Epoch ms at which the plan stops adding charge."""
+        for i in range(len(self.times) - 1, 0, -1):
+            if self.wh[i] > self.wh[i - 1]:
+                return self.times[i]
+        return None
+
+
+class SlotCache:
+    """Memoise the slot index so it is only decoded once per coordinator payload.
+       The expanded slot list is built lazily, the first time it is needed."""
+
+    def __init__(self):
+        self._version = None
+        self._index = SlotIndex()
+        self._slots = None
+        self._forecast = None
+
+    def index(self, version, data):
+        """Return the slot index for this data version, decoding it if needed."""
+        if version != self._version:
+            self._index = SlotIndex.from_session(data)
+            self._slots = None
+            self._forecast = None
+            self._version = version
+
+        return self._index
+
+    def get(self, version, data):
+        """Return the slot list for this data version, computing it if needed."""
+        index = self.index(version, data)
+        if self._slots is None:
+            self._slots = index.slot_list()
+
+        return self._slots
+
+    def forecast(self, version, data):
+        """Return the charge forecast table for this data version, computing it if needed."""
+        index = self.index(version, data)
+        if self._forecast is None:
+            self._forecast = ChargeForecast.from_session(data, index)
+
+        return self._forecast
+
+    def invalidate(self):
+        """Force the slot index to be rebuilt on next access."""
+        self._version = None
+
+
+def slot_list_str(options, index):
+    """Convert slot index to string."""
+    collapse_slots = not get_option(options, "never_collapse_slots", False)
+    starts, ends = index.view(collapse_slots)
+
+    state = ", ".join(
+        f"{strftime('%H:%M', localtime(start // 1000))}-{strftime('%H:%M', localtime(end // 1000))}"
+        for start, end in zip(starts, ends)
+    )
+
+    # Make sure we return None/Unknown if the list is empty
+    return None if state == "" else state
+
+
+def in_slot(index, now=None):
     """Are we currently in a charge slot?"""
-    slots = slot_list(data)
+    return index.current(now_ms() if now is None else now) is not None
 
-    # Loop through slots
-    for slot in slots:
-        # If we are in one
-        if slot['start'] < datetime.now().astimezone() and slot['end'] > datetime.now().astimezone():
-            return True
-    
-    return False
+
+def target_time_ms(data):
+    """Epoch ms of the next occurrence of the applied rule's target time."""
+    if not data or not data.get('appliedRule') or data['appliedRule'].get('targetTime') is None:
+        return None
+
+    target = data['appliedRule']['targetTime']
+    return int(time_next_occurs(target // 3600, (target % 3600) // 60).timestamp() * 1000)
 
 
 def time_next_occurs(hour, minute):
@@ -111,11 +328,11 @@ def time_next_occurs(hour, minute):
     return target
 
 
-def session_in_progress(hass, account_id, data):
+def session_in_progress(options, data):
     """Is there a session in progress?
        Used to check if we should update the current session rather than the first schedule."""
     # If config option set, never update session specific schedule
-    if get_option(hass, account_id, "never_session_specific"):
+    if get_option(options, "never_session_specific"):
         return False
     
     # Default to False with no data
@@ -129,6 +346,28 @@ def session_in_progress(hass, account_id, data):
     return True
 
 
-def get_option(hass, account_id, option, default=False):
+def get_option(options, option, default=False):
     """Return option value, with settable default."""
-    return hass.data[DOMAIN][account_id][DATA_OPTIONS].get(option, default)
+    return options.get(option, default)
+
+
+class PhaseTimer:
+    """Record wall time (ms) for each named phase of a multi-step operation."""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((perf_counter() - start) * 1000, 1)
+
+    @property
+    def total(self):
+        return round(sum(self.timings.values()), 1)
+
+    def __str__(self):
+        return ", ".join(f"{name}={ms}ms" for name, ms in self.timings.items())
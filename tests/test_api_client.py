@@ -0,0 +1,194 @@
+"""Tests for the API client."""
+import asyncio
+from time import time
+
+from custom_components.ohme.api_client import OhmeApiClient
+from custom_components.ohme.const import SNAPSHOT_MAX_AGE
+
+
+class _Response:
+    """Minimal stand in for an aiohttp response context manager."""
+
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def json(self):
+        return self._body
+
+    async def text(self):
+        return str(self._body)
+
+
+class _AuthSession:
+    """Replays canned responses and records the URLs requested."""
+
+    def __init__(self, *responses):
+        self._responses = list(responses)
+        self.urls = []
+
+    def post(self, url, data=None):
+        self.urls.append(url)
+        return self._responses.pop(0)
+
+    async def close(self):
+        pass
+
+
+async def _client(responses, **kwargs):
+    """Client with its auth session swapped for canned responses."""
+    client = OhmeApiClient("a@b.c", "pw", **kwargs)
+    await client._auth_session.close()
+    client._auth_session = _AuthSession(*responses)
+    return client
+
+
+async def test_stored_token_skips_login():
+    """A fresh stored token needs no auth requests."""
+    client = await _client([], token={"id_token": "id", "refresh_token": "refresh", "issued_at": time()})
+
+    await client.async_refresh_session()
+
+    assert client._auth_session.urls == []
+    assert client._get_headers()["Authorization"] == "Firebase id"
+    await client.async_close()
+
+
+async def test_revoked_token_falls_back_to_password():
+    """A rejected refresh token falls back to a password login, and the new token is passed on."""
+    stored = []
+    client = await _client(
+        [
+            _Response(400, {"error": "TOKEN_EXPIRED"}),
+            _Response(200, {"idToken": "new", "refreshToken": "refresh"})
+        ],
+        token={"id_token": "old", "refresh_token": "revoked", "issued_at": 0},
+        token_callback=stored.append
+    )
+
+    assert await client.async_refresh_session()
+
+    assert "securetoken" in client._auth_session.urls[0]
+    assert "verifyPassword" in client._auth_session.urls[1]
+    assert stored == [client.token]
+    assert client.token["id_token"] == "new"
+    assert client.token["refresh_token"] == "refresh"
+    await client.async_close()
+
+
+async def test_unchanged_writes_are_skipped():
+    """Writes matching the last snapshot return straight away without a request."""
+    client = await _client([])
+    client._last_mode = "SMART_CHARGE"
+    client._last_rule = {"targetPercent": 80, "targetTime": 25200, "preconditioningEnabled": False}
+    client._last_schedule = {"id": 1, "targetPercent": 90, "targetTime": 28800}
+    client._app_settings = {"buttonsLocked": True}
+    client._price_cap = {"enabled": True, "value": 15}
+    for name in ("schedule", "app_settings", "price_cap"):
+        client._snapshot_taken(name)
+
+    async def no_requests(*args, **kwargs):
+        raise AssertionError("Unexpected request")
+
+    client._get_request = client._put_request = client._post_request = no_requests
+
+    assert not await client.async_apply_session_rule(target_percent=80, target_time=(7, 0))
+    assert not await client.async_update_schedule(target_percent=90)
+    assert not await client.async_set_configuration_value({"buttonsLocked": True})
+    assert not await client.async_change_price_cap(enabled=True, cap=15)
+    assert client.skipped_writes == 4
+    await client.async_close()
+
+
+async def test_only_changed_settings_are_sent():
+    """Only app settings that differ are written, and the snapshot follows."""
+    client = await _client([])
+    client._app_settings = {"buttonsLocked": True, "stealthEnabled": False}
+    client._snapshot_taken("app_settings")
+    sent = []
+
+    async def put(url, data=None):
+        sent.append(data)
+        return True
+
+    client._put_request = put
+
+    assert await client.async_set_configuration_value({"buttonsLocked": True, "stealthEnabled": True})
+    assert sent == [{"stealthEnabled": True}]
+    assert not await client.async_set_configuration_value({"stealthEnabled": True})
+    await client.async_close()
+
+
+async def test_stale_snapshots_not_trusted():
+    """Writes are sent if the snapshot they match is too old to rule out changes in the app."""
+    client = await _client([])
+    client._app_settings = {"buttonsLocked": True}
+    client._price_cap = {"enabled": True, "value": 15}
+    client._snapshot_taken("app_settings")
+    client._snapshot_times["app_settings"] -= SNAPSHOT_MAX_AGE
+    sent = []
+
+    async def put(url, data=None):
+        sent.append(data)
+        return True
+
+    async def get(url, endpoint=None, **kwargs):
+        return {"chargeSettings": [{"enabled": False, "value": 15}]}
+
+    client._put_request = put
+    client._get_request = get
+
+    # Price cap snapshot was never timestamped, eg. account info isn't being polled
+    assert await client.async_change_price_cap(enabled=True)
+    assert await client.async_set_configuration_value({"buttonsLocked": True})
+    assert sent[1] == {"buttonsLocked": True}
+    assert client.skipped_writes == 0
+    await client.async_close()
+
+
+async def test_hedged_get():
+    """A slow request is hedged and the faster reply wins."""
+    client = await _client([])
+    delays = [0.2, 0.01]
+
+    async def get(url, endpoint, tracker, fields=None):
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        tracker.attempts.append(delay * 1000)
+        return delay
+
+    client._get = get
+    tracker = client._tracker("charge_sessions")
+
+    assert await client._hedged_get("/v1/chargeSessions", "charge_sessions", tracker, 0.02) == 0.01
+    assert tracker.hedged == 1
+    assert tracker.hedge_wins == 1
+
+    # Fast replies are never hedged
+    delays = [0.001]
+    assert await client._hedged_get("/v1/chargeSessions", "charge_sessions", tracker, 0.05) == 0.001
+    assert tracker.hedged == 1
+    await client.async_close()
+
+
+async def test_needs_account_info():
+    """Account info is only polled while an entity using it is enabled."""
+    client = await _client([])
+    client.serial = "chargerid"
+    client._capabilities = {"stealth": True}
+    client._disable_cap = True
+
+    assert client.account_info_entities() == ["sleep_when_inactive"]
+    assert client.needs_account_info()
+    assert not client.needs_account_info({"chargerid_sleep_when_inactive"})
+
+    client._capabilities = {}
+    assert not client.needs_account_info()
+
+    await client.async_close()
@@ -0,0 +1,128 @@
+"""Tests for the charge session archive."""
+import json
+
+from custom_components.ohme.archive import SessionArchive, SessionTracker, TRACKER_SAVE_INTERVAL_MS
+from custom_components.ohme.payload import select_fields, CHARGE_SESSION_FIELDS
+
+
+def _payload(mode, wh=0):
+    return {
+        "mode": mode,
+        "chargeGraph": {"now": {"x": 0, "y": wh}},
+        "allSessionSlots": [{"startTimeMs": 1000, "endTimeMs": 2000, "estimatedSoc": {"wh": wh}}],
+        "appliedRule": {"targetPercent": 80}
+    }
+
+
+async def test_tracker_emits_once_per_session():
+    """A record is produced when the session ends, and only once."""
+    tracker = SessionTracker()
+
+    assert tracker.update(_payload("DISCONNECTED"), now=0) is None
+    assert tracker.update(_payload("SMART_CHARGE", 100), now=1000) is None
+    assert tracker.update(_payload("SMART_CHARGE", 5000), now=2000) is None
+
+    record = tracker.update(_payload("FINISHED_CHARGE", 6000), now=3000)
+    assert record[:3] == (1000, 3000, 6000)
+    assert json.loads(record[3]) == [[1000, 2000, 6000]]
+    assert json.loads(record[4]) == {"targetPercent": 80}
+
+    assert tracker.update(_payload("DISCONNECTED"), now=4000) is None
+
+
+async def test_tracker_start_from_payload():
+    """The session starts at its first chargeGraph point, and approval alone isn't a session."""
+    tracker = SessionTracker()
+
+    assert tracker.update(_payload("PENDING_APPROVAL"), now=1000) is None
+    assert tracker.update(_payload("DISCONNECTED"), now=2000) is None
+
+    data = _payload("SMART_CHARGE", 100)
+    data['chargeGraph']['points'] = [{"x": 1700000000, "y": 0}]
+    tracker.update(data, now=1700000600000)
+
+    record = tracker.update(_payload("FINISHED_CHARGE", 6000), now=1700003600000)
+    assert record[:3] == (1700000000000, 1700003600000, 6000)
+
+
+async def test_tracker_start_time_kept():
+    """The payload's own start time survives field selection and wins over chargeGraph."""
+    tracker = SessionTracker()
+
+    data = _payload("SMART_CHARGE", 100)
+    data['startTime'] = 1699999000000
+    data['chargeGraph']['points'] = [{"x": 1700000000, "y": 0}]
+    tracker.update(select_fields(data, CHARGE_SESSION_FIELDS), now=1700000600000)
+
+    record = tracker.update(_payload("FINISHED_CHARGE", 6000), now=1700003600000)
+    assert record[0] == 1699999000000
+
+
+async def test_tracker_restored(tmp_path):
+    """A session in progress survives a restart, and is archived if it ended while we were down."""
+    archive = SessionArchive(str(tmp_path / "sessions.db"))
+    assert archive.load_tracker() is None
+
+    tracker = SessionTracker()
+    tracker.update(_payload("SMART_CHARGE", 5000), now=1000)
+    archive.save_tracker(tracker.as_dict())
+
+    restored = SessionTracker()
+    restored.restore(archive.load_tracker())
+    record = restored.update(_payload("DISCONNECTED"), now=90000)
+    assert record[:3] == (1000, 1000, 5000)
+
+    # A new session started after the saved one was last seen
+    restored.restore(archive.load_tracker())
+    data = _payload("SMART_CHARGE", 200)
+    data['chargeGraph']['points'] = [{"x": 1700000000, "y": 0}]
+    record = restored.update(data, now=1700000600000)
+    assert record[:3] == (1000, 1000, 5000)
+    assert restored.as_dict()["record"][0] == 1700000000000
+
+    archive.remove()
+    assert not (tmp_path / "sessions.db").exists()
+
+
+async def test_tracker_save_due():
+    """The session in progress is saved when it changes shape, otherwise only every so often."""
+    tracker = SessionTracker()
+    tracker.update(_payload("DISCONNECTED"), now=0)
+    assert not tracker.save_due(0)
+
+    tracker.update(_payload("SMART_CHARGE", 100), now=1000)
+    assert tracker.save_due(1000)
+    tracker.saved(1000)
+
+    # Only the end and energy have moved on
+    tracker.update(_payload("SMART_CHARGE", 100), now=31000)
+    assert not tracker.save_due(31000)
+    tracker.update(_payload("SMART_CHARGE", 100), now=1000 + TRACKER_SAVE_INTERVAL_MS)
+    assert tracker.save_due(1000 + TRACKER_SAVE_INTERVAL_MS)
+    tracker.saved(1000 + TRACKER_SAVE_INTERVAL_MS)
+
+    # New slots are saved straight away
+    tracker.update(_payload("SMART_CHARGE", 200), now=2000 + TRACKER_SAVE_INTERVAL_MS)
+    assert tracker.save_due(2000 + TRACKER_SAVE_INTERVAL_MS)
+    tracker.saved(2000 + TRACKER_SAVE_INTERVAL_MS)
+
+    tracker.update(_payload("FINISHED_CHARGE", 200), now=3000 + TRACKER_SAVE_INTERVAL_MS)
+    assert tracker.save_due(3000 + TRACKER_SAVE_INTERVAL_MS)
+
+
+async def test_archive_aggregate(tmp_path):
+    """Aggregates only cover sessions starting within the range."""
+    archive = SessionArchive(str(tmp_path / "sessions.db"))
+    archive.append((1000, 4000, 5000, "[]", None))
+    archive.append((10000, 12000, 3000, "[]", None))
+    archive.append((20000, 21000, 1000, "[]", None))
+
+    result = archive.aggregate(0, 15000)
+    assert result["sessions"] == 2
+    assert result["energy_wh"] == 8000
+    assert result["average_energy_wh"] == 4000
+    assert result["plugged_in_duration_s"] == 5
+    assert result["first_start_ms"] == 1000
+    assert result["last_end_ms"] == 12000
+
+    assert archive.aggregate(30000, 40000)["sessions"] == 0
@@ -0,0 +1,202 @@
+"""Tests for the command queue."""
+import asyncio
+
+from custom_components.ohme.commands import CommandQueue
+
+
+async def test_commands_run_in_order():
+    """Commands run one at a time in submission order."""
+    queue = CommandQueue()
+    log = []
+    release = asyncio.Event()
+
+    async def slow(name):
+        log.append(f"start {name}")
+        await release.wait()
+        log.append(f"end {name}")
+        return name
+
+    first = asyncio.create_task(queue.submit("a", slow, {"name": "a"}))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(queue.submit("b", slow, {"name": "b"}))
+    await asyncio.sleep(0)
+
+    assert queue.depth == 1
+    release.set()
+
+    assert await asyncio.gather(first, second) == ["a", "b"]
+    assert log == ["start a", "end a", "start b", "end b"]
+    assert queue.completed == 2
+    assert queue.last_latency is not None
+
+
+async def test_superseded_command_is_skipped():
+    """A pause then resume queued behind another command only sends the resume."""
+    queue = CommandQueue()
+    sent = []
+    release = asyncio.Event()
+
+    async def busy():
+        await release.wait()
+
+    async def send(action):
+        sent.append(action)
+        return action
+
+    blocker = asyncio.create_task(queue.submit("other", busy))
+    await asyncio.sleep(0)
+    pause = asyncio.create_task(queue.submit("charge_state", send, {"action": "pause"}))
+    resume = asyncio.create_task(queue.submit("charge_state", send, {"action": "resume"}))
+    await asyncio.sleep(0)
+    release.set()
+    await blocker
+
+    assert await pause == "resume"
+    assert await resume == "resume"
+    assert sent == ["resume"]
+    assert queue.superseded == 1
+
+
+async def test_merged_command():
+    """Merged commands combine their arguments, with later values winning."""
+    queue = CommandQueue()
+    calls = []
+    release = asyncio.Event()
+
+    async def busy():
+        await release.wait()
+
+    async def rule(**kwargs):
+        calls.append(kwargs)
+        return True
+
+    blocker = asyncio.create_task(queue.submit("other", busy))
+    await asyncio.sleep(0)
+    tasks = [
+        asyncio.create_task(queue.submit("rule", rule, {"target_percent": 80}, merge=True)),
+        asyncio.create_task(queue.submit("rule", rule, {"target_time": (7, 0)}, merge=True)),
+        asyncio.create_task(queue.submit("rule", rule, {"target_percent": 90}, merge=True))
+    ]
+    await asyncio.sleep(0)
+    release.set()
+    await blocker
+    await asyncio.gather(*tasks)
+
+    assert calls == [{"target_percent": 90, "target_time": (7, 0)}]
+
+
+async def test_failed_command():
+    """Errors are raised to everyone waiting on the command."""
+    queue = CommandQueue()
+
+    async def fail():
+        raise ValueError
+
+    try:
+        await queue.submit("a", fail)
+        assert False
+    except ValueError:
+        pass
+
+    assert queue.depth == 0
+
+
+async def test_delayed_commands_batch():
+    """Commands submitted within the delay are sent as one."""
+    queue = CommandQueue()
+    calls = []
+
+    async def put(**values):
+        calls.append(values)
+        return True
+
+    await asyncio.gather(
+        queue.submit("app_settings", put, {"buttonsLocked": True}, merge=True, delay=0.05),
+        queue.submit("app_settings", put, {"stealthEnabled": True}, merge=True, delay=0.05),
+        queue.submit("app_settings", put, {"solarMode": "IGNORE"}, merge=True, delay=0.05)
+    )
+
+    assert calls == [{"buttonsLocked": True, "stealthEnabled": True, "solarMode": "IGNORE"}]
+
+
+async def test_cancelled_caller_only_cancels_itself():
+    """A caller cancelled while running a merged command leaves it for the others waiting on it."""
+    queue = CommandQueue()
+    calls = []
+    release = asyncio.Event()
+
+    async def busy():
+        await release.wait()
+
+    async def rule(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return kwargs
+
+    blocker = asyncio.create_task(queue.submit("other", busy))
+    await asyncio.sleep(0)
+    first = asyncio.create_task(queue.submit("rule", rule, {"target_percent": 80}, merge=True))
+    second = asyncio.create_task(queue.submit("rule", rule, {"target_time": (7, 0)}, merge=True))
+    await asyncio.sleep(0)
+    release.set()
+    await blocker
+
+    while not calls:
+        await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == {"target_percent": 80, "target_time": (7, 0)}
+    assert first.cancelled()
+    assert len(calls) == 2
+
+
+async def test_delayed_command_not_dispatched_early():
+    """An immediate command doesn't drain a delayed one before its merge window closes."""
+    queue = CommandQueue()
+    calls = []
+
+    async def put(**values):
+        calls.append(values)
+        return True
+
+    async def pause():
+        calls.append("pause")
+        return True
+
+    first = asyncio.create_task(queue.submit("app_settings", put, {"buttonsLocked": True}, merge=True, delay=0.05))
+    await asyncio.sleep(0)
+
+    assert await queue.submit("charge_state", pause)
+    assert calls == ["pause"]
+
+    second = asyncio.create_task(queue.submit("app_settings", put, {"stealthEnabled": True}, merge=True, delay=0.05))
+    await asyncio.gather(first, second)
+
+    assert calls == ["pause", {"buttonsLocked": True, "stealthEnabled": True}]
+
+
+async def test_cancelled_delayed_command_dropped():
+    """A delayed command whose only caller is cancelled isn't sent by the next submit."""
+    queue = CommandQueue()
+    calls = []
+
+    async def put(**values):
+        calls.append(values)
+        return True
+
+    async def pause():
+        calls.append("pause")
+        return True
+
+    held = asyncio.create_task(queue.submit("app_settings", put, {"buttonsLocked": True}, merge=True, delay=0.05))
+    await asyncio.sleep(0)
+    held.cancel()
+    await asyncio.sleep(0)
+
+    assert held.cancelled()
+    assert queue.depth == 0
+
+    await asyncio.sleep(0.06)
+    assert await queue.submit("charge_state", pause)
+    assert calls == ["pause"]
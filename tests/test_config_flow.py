@@ -26,3 +26,58 @@ async def test_step_account(hass):
     }
 
     assert expected == result
+
+
+async def test_options_keep_short_schedule_interval(hass):
+    """Schedule intervals set before the default went up to 30 minutes are kept."""
+    entry = MockConfigEntry(domain=DOMAIN, data={"email": "a@b.c", "password": "pw"}, options={"interval_schedules": 15})
+    entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        user_input={
+            "email": "a@b.c",
+            "never_session_specific": False,
+            "never_collapse_slots": False,
+            "hedge_requests": False,
+            "interval_chargesessions": 0.5,
+            "interval_accountinfo": 1,
+            "interval_advanced": 1,
+            "interval_schedules": 15
+        }
+    )
+
+    assert result["type"] == "create_entry"
+    assert entry.options["interval_schedules"] == 15
+
+
+async def test_options_update_listener_runs_once(hass):
+    """Saving new credentials and options updates the entry once."""
+    entry = MockConfigEntry(domain=DOMAIN, data={"email": "a@b.c", "password": "pw"}, options={})
+    entry.add_to_hass(hass)
+    listener = mock.AsyncMock()
+    entry.add_update_listener(listener)
+
+    result = await hass.config_entries.options.async_init(entry.entry_id)
+    with mock.patch.object(config_flow.OhmeApiClient, "async_refresh_session", return_value=True):
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"],
+            user_input={
+                "email": "new@b.c",
+                "password": "new",
+                "never_session_specific": False,
+                "never_collapse_slots": True,
+                "hedge_requests": False,
+                "interval_chargesessions": 0.5,
+                "interval_accountinfo": 1,
+                "interval_advanced": 1,
+                "interval_schedules": 30
+            }
+        )
+    await hass.async_block_till_done()
+
+    assert result["type"] == "create_entry"
+    assert entry.data["email"] == "new@b.c"
+    assert entry.options["never_collapse_slots"]
+    listener.assert_called_once()
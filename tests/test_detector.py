@@ -0,0 +1,70 @@
+"""Tests for the charging detector."""
+from custom_components.ohme.detector import ChargingDetector
+
+
+async def test_detector_upwards_immediate_downwards_confirmed():
+    """Charging is reported straight away, stopping needs consecutive readings."""
+    detector = ChargingDetector()
+
+    assert not detector.update(0, 0, 1000, False)
+    assert detector.update(30, 7000, 1100, False)
+
+    # Wh stalls, but it takes three readings to report it
+    assert detector.update(60, 7000, 1100, False)
+    assert detector.update(90, 7000, 1100, False)
+    assert not detector.update(120, 7000, 1100, False)
+
+
+async def test_detector_slot_boundary_drop():
+    """A power drop as a slot ends is reported on the next tick."""
+    detector = ChargingDetector()
+
+    detector.update(0, 7000, 1000, True)
+    assert detector.update(30, 7000, 1100, True)
+    assert not detector.update(60, 2000, 1150, False)
+
+
+async def test_detector_suppresses_close_samples():
+    """Samples inside the minimum interval are ignored."""
+    detector = ChargingDetector()
+
+    detector.update(0, 0, 1000, False)
+    assert not detector.update(2, 7000, 1100, False)
+    assert len(detector.samples) == 1
+
+
+async def test_detector_disconnected():
+    """No power reading means not charging, and the next reading falls back to power."""
+    detector = ChargingDetector()
+
+    detector.update(0, 7000, 1000, False)
+    assert detector.update(30, 7000, 1100, False)
+    assert not detector.update(60, None, None, False)
+    assert detector.update(90, 7000, 1200, False)
+
+
+async def test_detector_wh_window():
+    """A wider Wh window rides through Wh readings that update slowly."""
+    detector = ChargingDetector(wh_window=3, off_readings=1)
+
+    detector.update(0, 7000, 1000, False)
+    assert detector.update(30, 7000, 1100, False)
+    assert detector.update(60, 7000, 1100, False)
+    assert detector.update(90, 7000, 1100, False)
+    assert not detector.update(120, 7000, 1100, False)
+
+
+async def test_detector_restore():
+    """Saved context is restored, apart from samples that are too old to use."""
+    detector = ChargingDetector()
+    detector.update(1000, 7000, 100, True)
+    detector.update(1060, 7000, 200, True)
+
+    restored = ChargingDetector()
+    restored.restore(detector.as_dict(), 1100, max_age=60)
+
+    assert restored.state
+    assert [sample[0] for sample in restored.samples] == [1060]
+
+    # Wh carries on going up from the restored sample, so still charging
+    assert restored.update(1120, 7000, 300, True)
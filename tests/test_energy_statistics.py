@@ -0,0 +1,104 @@
+"""Tests for the energy statistics import."""
+from types import SimpleNamespace
+
+from custom_components.ohme.energy_statistics import EnergyStatisticsImporter
+
+HOUR = 3600000
+# chargeGraph x values this small would be read as seconds
+BASE = 1700000000000 - 1700000000000 % HOUR
+
+
+def _payload(points, mode="SMART_CHARGE"):
+    return {"mode": mode, "chargeGraph": {"points": [{"x": x, "y": y} for x, y in points]}}
+
+
+def _importer(last=None):
+    """Importer with the recorder stubbed out. Returns it with a list of imported (start ms, state, sum)."""
+    importer = EnergyStatisticsImporter(SimpleNamespace(config=SimpleNamespace(components={"recorder"})), "chargerid")
+    imported = []
+
+    async def _load():
+        if last:
+            importer._imported_until, importer._last_wh, importer._last_sum = last
+
+    def _write(statistics):
+        imported.extend((int(row['start'].timestamp() * 1000), row['state'], row['sum']) for row in statistics)
+
+    importer._async_load_last = _load
+    importer._async_write = _write
+    return importer, imported
+
+
+async def test_hours_imported_incrementally():
+    """Energy added to an hour after it was first seen is counted, and each hour is only written once."""
+    importer, imported = _importer()
+    points = [(BASE + 10 * HOUR + 60000, 100), (BASE + 10 * HOUR + 1800000, 900)]
+
+    await importer.async_update(_payload(points), now=BASE + 10 * HOUR + 1800001)
+    assert imported == []
+
+    points += [(BASE + 11 * HOUR + 60000, 1500)]
+    await importer.async_update(_payload(points), now=BASE + 11 * HOUR + 60001)
+    await importer.async_update(_payload(points), now=BASE + 11 * HOUR + 120000)
+
+    points += [(BASE + 12 * HOUR + 60000, 2600)]
+    await importer.async_update(_payload(points), now=BASE + 12 * HOUR + 60001)
+
+    assert imported == [(BASE + 10 * HOUR, 900, 900), (BASE + 11 * HOUR, 1500, 1500)]
+
+
+async def test_restart_counts_from_last_hour():
+    """After a restart the next hour is counted from the cumulative Wh already imported."""
+    importer, imported = _importer(last=(BASE + 10 * HOUR, 900, 5000))
+    points = [(BASE + 10 * HOUR + 60000, 100), (BASE + 10 * HOUR + 1800000, 900), (BASE + 11 * HOUR + 60000, 1500), (BASE + 12 * HOUR, 1600)]
+
+    await importer.async_update(_payload(points), now=BASE + 12 * HOUR + 1)
+
+    assert imported == [(BASE + 11 * HOUR, 1500, 5600)]
+
+
+async def test_open_hour_flushed_when_session_ends():
+    """The last partial hour is written once the car disconnects."""
+    importer, imported = _importer(last=(BASE + 8 * HOUR, 4000, 5000))
+    points = [(BASE + 10 * HOUR + 60000, 100), (BASE + 10 * HOUR + 1800000, 700)]
+
+    await importer.async_update(_payload(points), now=BASE + 10 * HOUR + 1800001)
+    await importer.async_update({"mode": "DISCONNECTED"}, now=BASE + 10 * HOUR + 2000000)
+    await importer.async_update({"mode": "DISCONNECTED"}, now=BASE + 10 * HOUR + 2100000)
+
+    # A new session starts from zero rather than the previous session's total
+    assert imported == [(BASE + 10 * HOUR, 700, 5700)]
+
+
+async def test_second_session_in_flushed_hour():
+    """Energy from a session starting in the hour the last one was flushed in is added to that hour."""
+    importer, imported = _importer(last=(BASE + 8 * HOUR, 4000, 5000))
+
+    await importer.async_update(_payload([(BASE + 10 * HOUR + 60000, 100), (BASE + 10 * HOUR + 600000, 700)]), now=BASE + 10 * HOUR + 600001)
+    await importer.async_update({"mode": "DISCONNECTED"}, now=BASE + 10 * HOUR + 900000)
+
+    points = [(BASE + 10 * HOUR + 1200000, 0), (BASE + 10 * HOUR + 3000000, 300), (BASE + 11 * HOUR + 60000, 900)]
+    await importer.async_update(_payload(points[:2]), now=BASE + 10 * HOUR + 3000001)
+    await importer.async_update(_payload(points), now=BASE + 11 * HOUR + 60001)
+    await importer.async_update({"mode": "DISCONNECTED"}, now=BASE + 11 * HOUR + 120000)
+
+    assert imported == [
+        (BASE + 10 * HOUR, 700, 5700),
+        # The flushed hour is written again with the second session's energy added
+        (BASE + 10 * HOUR, 300, 6000),
+        (BASE + 11 * HOUR, 900, 6600)
+    ]
+
+
+async def test_flushed_hour_same_session_resumes():
+    """A session whose graph went missing for a poll isn't counted twice."""
+    importer, imported = _importer(last=(BASE + 8 * HOUR, 4000, 5000))
+    points = [(BASE + 10 * HOUR + 60000, 100), (BASE + 10 * HOUR + 600000, 700)]
+
+    await importer.async_update(_payload(points), now=BASE + 10 * HOUR + 600001)
+    await importer.async_update({"mode": "SMART_CHARGE"}, now=BASE + 10 * HOUR + 900000)
+
+    points += [(BASE + 10 * HOUR + 1800000, 1000), (BASE + 11 * HOUR + 60000, 1200)]
+    await importer.async_update(_payload(points), now=BASE + 11 * HOUR + 60001)
+
+    assert imported == [(BASE + 10 * HOUR, 700, 5700), (BASE + 10 * HOUR, 1000, 6000)]
@@ -0,0 +1,156 @@
+"""Tests for applying config entry changes."""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.ohme import async_update_listener
+from custom_components.ohme.api_client import OhmeApiClient
+from custom_components.ohme.const import CONFIG_VERSION, DOMAIN
+from custom_components.ohme.coordinator import OhmeAccountInfoCoordinator, OhmeRuntimeData
+from custom_components.ohme.utils import SlotCache
+
+RESPONSES = {
+    "account": {
+        "user": {"id": "user"},
+        "tariff": None,
+        "userSettings": {"chargeSettings": [{"enabled": False, "value": 20}]},
+        "chargeDevices": [{
+            "id": "chargerid",
+            "provisioningTs": 0,
+            "modelTypeDisplayName": "Ohme Home Pro",
+            "firmwareVersionLabel": "1.0",
+            "modelCapabilities": {"solarModes": [], "pluginsRequireApprovalMode": True},
+            "optionalSettings": {"pluginsRequireApproval": False}
+        }]
+    },
+    "charge_sessions": [{
+        "mode": "DISCONNECTED",
+        "power": None,
+        "car": None,
+        "batterySoc": None,
+        "batterySocBefore": None,
+        "appliedRule": None,
+        "allSessionSlots": [],
+        "chargeGraph": None
+    }],
+    "advanced_settings": {"clampAmps": 0, "online": True},
+    "schedules": [{"targetPercent": 80, "targetTime": 25200, "preconditioningEnabled": False, "preconditionLengthMins": 30}]
+}
+
+
+async def _get_request(self, url, endpoint=None, hedge=False, fields=None):
+    return RESPONSES[endpoint]
+
+
+async def test_setup_and_unload(hass):
+    """A version 1 entry is migrated, set up with its runtime data and unloaded."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=1,
+        data={"email": "a@b.c", "password": "pw", "token": None}
+    )
+    entry.add_to_hass(hass)
+
+    # Unique ID from before version 2
+    er.async_get(hass).async_get_or_create(
+        "number", DOMAIN, "ohme_chargerid_target_percent", config_entry=entry
+    )
+
+    with mock.patch.object(OhmeApiClient, "async_refresh_session", return_value=True), \
+            mock.patch.object(OhmeApiClient, "_get_request", _get_request):
+        assert await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    assert entry.state is ConfigEntryState.LOADED
+    assert entry.version == CONFIG_VERSION
+    assert er.async_get(hass).async_get_entity_id("number", DOMAIN, "chargerid_target_percentage")
+
+    assert isinstance(entry.runtime_data, OhmeRuntimeData)
+    assert entry.runtime_data.client.serial == "chargerid"
+    assert entry.runtime_data.charge_sessions.data["mode"] == "DISCONNECTED"
+    assert "button" in entry.runtime_data.platforms
+
+    client = entry.runtime_data.client
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert entry.state is ConfigEntryState.NOT_LOADED
+    assert client._session.closed
+
+
+async def test_setup_retry_closes_client(hass):
+    """Each failed setup attempt closes the client it made."""
+    entry = MockConfigEntry(domain=DOMAIN, version=CONFIG_VERSION, data={"email": "a@b.c", "password": "pw", "token": None})
+    entry.add_to_hass(hass)
+    clients = []
+
+    async def _failing_get_request(self, url, endpoint=None, hedge=False, fields=None):
+        clients.append(self)
+        if endpoint == "charge_sessions":
+            raise Exception("Unavailable")
+        return RESPONSES[endpoint]
+
+    with mock.patch.object(OhmeApiClient, "async_refresh_session", return_value=True), \
+            mock.patch.object(OhmeApiClient, "_get_request", _failing_get_request):
+        assert not await hass.config_entries.async_setup(entry.entry_id)
+        await hass.async_block_till_done()
+
+    assert entry.state is ConfigEntryState.SETUP_RETRY
+    assert clients and all(client._session.closed and client._auth_session.closed for client in clients)
+
+
+async def test_apply_options_interval(hass):
+    """Refresh intervals change in place."""
+    coordinator = OhmeAccountInfoCoordinator(hass, None, {})
+    assert coordinator.update_interval == timedelta(minutes=1)
+
+    coordinator.apply_options({"interval_accountinfo": 5})
+    assert coordinator.update_interval == timedelta(minutes=5)
+
+
+def _entry(options, password="pw"):
+    coordinator = mock.Mock()
+    runtime = SimpleNamespace(
+        client=SimpleNamespace(uses_credentials=lambda email, pw: pw == "pw", hedge_requests=False),
+        options={},
+        slot_cache=SlotCache(),
+        charge_sessions=coordinator,
+        coordinators=lambda: [coordinator]
+    )
+    entry = SimpleNamespace(
+        entry_id="abc",
+        state=ConfigEntryState.LOADED,
+        data={"email": "a@b.c", "password": password},
+        options=options,
+        runtime_data=runtime
+    )
+    return entry, coordinator
+
+
+async def test_options_applied_live(hass):
+    """Option changes are applied to the running coordinators without a reload."""
+    entry, coordinator = _entry({"never_collapse_slots": True, "hedge_requests": True})
+
+    with mock.patch.object(hass.config_entries, "async_reload") as reload:
+        await async_update_listener(hass, entry)
+
+    reload.assert_not_called()
+    assert entry.runtime_data.options == entry.options
+    assert entry.runtime_data.client.hedge_requests
+    coordinator.apply_options.assert_called_once_with(entry.options)
+    coordinator.async_update_listeners.assert_called_once()
+
+
+async def test_credentials_change_reloads(hass):
+    """Only a credential change reloads the entry."""
+    entry, coordinator = _entry({}, password="new")
+
+    with mock.patch.object(hass.config_entries, "async_reload") as reload:
+        await async_update_listener(hass, entry)
+
+    reload.assert_called_once_with("abc")
+    coordinator.apply_options.assert_not_called()
@@ -0,0 +1,23 @@
+"""Tests for the latency metrics."""
+from custom_components.ohme.metrics import percentile, LatencyTracker
+
+
+async def test_percentile():
+    """Nearest-rank percentiles."""
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 95) == 95
+    assert percentile(samples, 100) == 100
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+async def test_hedge_delay_needs_samples():
+    """No hedging until there are enough samples to know the p95."""
+    tracker = LatencyTracker()
+    tracker.attempts.extend([100] * 19)
+    assert tracker.hedge_delay(20) is None
+
+    tracker.attempts.append(2000)
+    assert tracker.hedge_delay(20) == 100
+    assert tracker.summary()["p95"] is None
@@ -0,0 +1,25 @@
+"""Tests for response payload decoding."""
+import gzip
+import json
+
+from custom_components.ohme.payload import decode_body, select_fields, CHARGE_SESSION_FIELDS
+
+
+async def test_decode_body():
+    """Compressed bodies are decoded and their raw size reported."""
+    raw = json.dumps([{"mode": "SMART_CHARGE", "power": {"watt": 7000}, "unused": {"big": list(range(100))}}]).encode()
+
+    data, raw_bytes = decode_body(gzip.compress(raw), "gzip", CHARGE_SESSION_FIELDS)
+    assert data == [{"mode": "SMART_CHARGE", "power": {"watt": 7000}}]
+    assert raw_bytes == len(raw)
+
+    data, _ = decode_body(raw, "")
+    assert data[0]["unused"]["big"][-1] == 99
+
+
+async def test_select_fields():
+    """Missing keys are left missing rather than filled in."""
+    assert select_fields({"mode": "DISCONNECTED", "car": None, "other": 1}, ("mode", "car", "power")) == {
+        "mode": "DISCONNECTED",
+        "car": None
+    }
@@ -0,0 +1,56 @@
+"""Tests for the services."""
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.ohme import services, utils
+
+
+async def test_build_plan():
+    """Plan is built from the cached slot index with a single now."""
+    data = {
+        "mode": "SMART_CHARGE",
+        "batterySocBefore": {"wh": 0, "percent": 10},
+        "batterySoc": {"wh": 1000, "percent": 20},
+        "car": None,
+        "appliedRule": {"targetPercent": 80},
+        "allSessionSlots": [
+            {"startTimeMs": 1000000, "endTimeMs": 2800000, "estimatedSoc": {"wh": 3500, "percent": 50}},
+            {"startTimeMs": 2800000, "endTimeMs": 4600000, "estimatedSoc": {"wh": 7000, "percent": 80}}
+        ]
+    }
+    cache = utils.SlotCache()
+    coordinator = SimpleNamespace(
+        data=data,
+        slot_index=lambda: cache.index(1, data),
+        forecast=lambda: cache.forecast(1, data)
+    )
+    plan = services.build_plan({}, coordinator, 1900000)
+
+    assert plan["slot_active"]
+    assert plan["slots"] == [{"start": services._ms_to_iso(1000000), "end": services._ms_to_iso(4600000)}]
+    assert plan["next_slot_start"] is None
+    assert plan["next_slot_end"] == services._ms_to_iso(4600000)
+    assert plan["battery_soc"] == 20
+    assert plan["target_percent"] == 80
+    assert plan["energy_remaining_wh"] == 5250
+    assert plan["projected_completion"] == services._ms_to_iso(4600000)
+
+    data["mode"] = "DISCONNECTED"
+    assert services.build_plan({}, coordinator, 1900000)["slots"] == []
+
+
+async def test_settings_values():
+    """Service fields map to app settings, and unsupported ones are rejected."""
+    client = SimpleNamespace(
+        is_capable=lambda capability: capability != "stealth",
+        solar_capable=lambda: True
+    )
+
+    assert services.settings_values(client, {"lock_buttons": True, "solar_boost": False}) == {
+        "buttonsLocked": True,
+        "solarMode": "IGNORE"
+    }
+
+    with pytest.raises(services.ServiceValidationError):
+        services.settings_values(client, {"sleep_when_inactive": True})
@@ -0,0 +1,58 @@
+"""Tests for the session statistics."""
+from custom_components.ohme.session import SessionStats, graph_time_ms, hourly_energy
+
+
+def _payload(watts, points, mode="SMART_CHARGE"):
+    """Minimal charge session payload with a power reading and chargeGraph points."""
+    return {
+        "mode": mode,
+        "power": {"watt": watts},
+        "chargeGraph": {"points": [{"x": x, "y": y} for x, y in points]}
+    }
+
+
+async def test_graph_time_normalised():
+    """chargeGraph x values in seconds or milliseconds both map to ms."""
+    assert graph_time_ms(1700000000) == 1700000000000
+    assert graph_time_ms(1700000000000) == 1700000000000
+
+
+async def test_session_stats_fold():
+    """Power readings and new graph points are folded in incrementally."""
+    stats = SessionStats()
+
+    stats.update(_payload(0, [(1000, 0)]), now=0)
+    stats.update(_payload(7000, [(1000, 0), (2800, 3500)]), now=30000)
+    stats.update(_payload(3000, [(1000, 0), (2800, 3500), (4600, 7000)]), now=60000)
+    stats.update(_payload(0, [(1000, 0), (2800, 3500), (4600, 7000)]), now=90000)
+
+    assert len(stats.points) == 3
+    assert stats.peak_power == 7000
+    assert stats.charging_time == 60
+    assert stats.average_power == 5000
+    assert stats.energy_rate == 7000
+
+    # Unplugging ends the session
+    stats.update(_payload(0, [], mode="DISCONNECTED"), now=120000)
+    assert stats.peak_power is None
+    assert stats.energy_rate is None
+
+
+async def test_session_stats_buffer_bounded():
+    """Ring buffer never grows past its size."""
+    stats = SessionStats(maxlen=5)
+    for i in range(20):
+        stats.update(_payload(1000, [(x, x) for x in range(i + 1)]), now=i * 1000)
+
+    assert len(stats.points) == 5
+    assert len(stats.readings) == 5
+    assert stats.charging_time == 19
+
+
+async def test_hourly_energy_buckets():
+    """Only complete hours are returned, with gaps carried forward."""
+    hour = 3600000
+    points = [(10 * hour + 60000, 100), (10 * hour + 1800000, 900), (12 * hour + 60000, 2000), (13 * hour, 2500)]
+
+    assert hourly_energy(points, 13 * hour + 1) == [(10 * hour, 900), (11 * hour, 900), (12 * hour, 2000)]
+    assert hourly_energy(points, 10 * hour + 1800000) == []
@@ -0,0 +1,47 @@
+"""Tests for charge state transitions."""
+from custom_components.ohme.transitions import session_transitions, SessionEvents
+from custom_components.ohme.utils import SlotIndex
+
+
+def _mode(mode):
+    return {"mode": mode}
+
+
+async def test_session_transitions():
+    """Mode changes map to the transitions other coordinators refresh on."""
+    assert session_transitions(None, _mode("SMART_CHARGE")) == set()
+    assert session_transitions(_mode("SMART_CHARGE"), _mode("SMART_CHARGE")) == set()
+
+    assert session_transitions(_mode("DISCONNECTED"), _mode("PENDING_APPROVAL")) == {"plugged_in"}
+    assert session_transitions(_mode("PENDING_APPROVAL"), _mode("SMART_CHARGE")) == {"approved"}
+    assert session_transitions(_mode("PENDING_APPROVAL"), _mode("DISCONNECTED")) == {"unplugged"}
+    assert session_transitions(_mode("SMART_CHARGE"), _mode("FINISHED_CHARGE")) == {"finished"}
+    assert session_transitions(_mode("DISCONNECTED"), _mode("FINISHED_CHARGE")) == {"plugged_in", "finished"}
+
+
+async def test_session_events():
+    """Consecutive payloads are diffed into typed events."""
+    slots = {
+        "batterySocBefore": {"wh": 0},
+        "allSessionSlots": [{"startTimeMs": 1000000, "endTimeMs": 2800000, "estimatedSoc": {"wh": 3500}}]
+    }
+    index = SlotIndex.from_session(slots)
+    events = SessionEvents()
+
+    def payload(mode, soc):
+        return {**slots, "mode": mode, "car": None, "batterySoc": {"percent": soc}, "appliedRule": {"targetPercent": 80}}
+
+    # Nothing is fired for the first payload
+    assert events.update(None, payload("DISCONNECTED", None), index, 500000) == []
+
+    fired = events.update(payload("DISCONNECTED", None), payload("PENDING_APPROVAL", 50), index, 600000)
+    assert [event for event, _ in fired] == ["ohme_plugged_in", "ohme_approval_required"]
+
+    fired = events.update(payload("PENDING_APPROVAL", 50), payload("SMART_CHARGE", 60), index, 1200000)
+    assert [event for event, _ in fired] == ["ohme_slot_started"]
+
+    fired = events.update(payload("SMART_CHARGE", 60), payload("SMART_CHARGE", 80), index, 2000000)
+    assert fired == [("ohme_target_reached", {"mode": "SMART_CHARGE", "battery_soc": 80, "target_percent": 80})]
+
+    fired = events.update(payload("SMART_CHARGE", 80), payload("FINISHED_CHARGE", 80), index, 3000000)
+    assert [event for event, _ in fired] == ["ohme_slot_ended", "ohme_charge_finished"]
@@ -4,3 +4,141 @@ import random
 from time import time
 
 from custom_components.ohme import utils
+
+
+def _session(slots, soc_before=0):
+    """Build a minimal charge session payload from (start, end, wh) tuples."""
+    return {
+        "batterySocBefore": {"wh": soc_before},
+        "allSessionSlots": [
+            {"startTimeMs": start * 1000, "endTimeMs": end * 1000, "estimatedSoc": {"wh": wh}}
+            for start, end, wh in slots
+        ]
+    }
+
+
+async def test_slot_cache_memoises_per_version():
+    """Slot index is only decoded when the data version changes."""
+    cache = utils.SlotCache()
+    data = _session([(1000, 2800, 3000)])
+
+    with mock.patch.object(utils.SlotIndex, "from_session", wraps=utils.SlotIndex.from_session) as decode:
+        index = cache.index(1, data)
+        assert cache.index(1, data) is index
+        assert cache.get(1, data) is cache.get(1, data)
+        assert decode.call_count == 1
+
+        cache.get(2, data)
+        assert decode.call_count == 2
+
+        cache.invalidate()
+        cache.index(2, data)
+        assert decode.call_count == 3
+
+    assert cache.get(2, data)[0]['charge_in_kwh'] == -3.0
+    assert cache.get(2, data)[0]['start'].timestamp() == 1000
+
+
+async def test_slot_index_lookups():
+    """Current/next lookups use the collapsed or uncollapsed view as asked."""
+    index = utils.SlotIndex.from_session(_session([(1000, 2800, 1000), (2800, 4600, 2000), (8200, 10000, 3000)]))
+
+    assert list(index.collapsed_starts) == [1000000, 8200000]
+    assert list(index.collapsed_ends) == [4600000, 10000000]
+
+    assert index.current(2000000) == (1000000, 2800000)
+    assert index.current(2800000) is None
+    assert index.current(2800000, collapsed=True) == (1000000, 4600000)
+    assert index.current(5000000) is None
+
+    assert index.next_start(2000000) == 2800000
+    assert index.next_start(2000000, collapsed=True) == 8200000
+    assert index.next_end(2000000, collapsed=True) == 4600000
+    assert index.next_start(10000000) is None
+    assert index.next_end(10000000) is None
+
+    assert index.in_range(3000000, 9000000) == [(2800000, 4600000), (8200000, 10000000)]
+    assert index.in_range(4600000, 8200000) == []
+
+    assert index.upcoming(2000000, collapsed=True) == (1000000, 4600000)
+    assert index.upcoming(5000000) == (8200000, 10000000)
+    assert index.upcoming(10000000) is None
+
+    assert utils.in_slot(index, now=1500000)
+    assert not utils.in_slot(index, now=6000000)
+
+
+async def test_slot_index_empty():
+    """Missing or empty slot lists decode to an empty index."""
+    assert len(utils.SlotIndex.from_session({"allSessionSlots": None})) == 0
+    assert utils.SlotIndex.from_session(None).slot_list() == []
+
+
+async def test_slot_index_fractional_wh():
+    """Estimated Wh is a float in the API payload."""
+    data = _session([(1000, 2800, 1500.5), (2800, 4600, 3250.75)], soc_before=250.25)
+    index = utils.SlotIndex.from_session(data)
+
+    slots = index.slot_list()
+    assert slots[0]['charge_in_kwh'] == -1.25025
+    assert slots[1]['charge_in_kwh'] == -1.75025
+    assert utils.ChargeForecast.from_session(data, index).wh_at(4600000) == 3250.75
+
+
+async def test_charge_forecast_interpolation():
+    """Forecast interpolates Wh and SoC within slots and holds between them."""
+    data = _session([(1000, 2000, 2000), (3000, 4000, 4000), (4000, 5000, 4000)], soc_before=1000)
+    data['batterySocBefore']['percent'] = 10
+    for slot, percent in zip(data['allSessionSlots'], (20, 40, 40)):
+        slot['estimatedSoc']['percent'] = percent
+
+    forecast = utils.ChargeForecast.from_session(data, utils.SlotIndex.from_session(data))
+
+    assert forecast.wh_at(0) == 1000
+    assert forecast.wh_at(1500000) == 1500
+    assert forecast.wh_at(2500000) == 2000
+    assert forecast.percent_at(3500000) == 30
+    assert forecast.percent_at(9000000) == 40
+    assert forecast.energy_remaining(1500000) == 2500
+    assert forecast.completion() == 4000000
+
+    # Without percentages we can still forecast energy
+    del data['allSessionSlots'][0]['estimatedSoc']['percent']
+    forecast = utils.ChargeForecast.from_session(data, utils.SlotIndex.from_session(data))
+    assert forecast.percent_at(3500000) is None
+    assert forecast.energy_remaining(0) == 3000
+
+    assert utils.ChargeForecast().energy_remaining(0) is None
+
+
+async def test_slot_index_dispatches():
+    """Dispatches are split on end time and use serialisable values."""
+    index = utils.SlotIndex.from_session(_session([(1000, 2800, 1000), (2800, 4600, 2000)]))
+
+    planned, completed = index.dispatches(2800000)
+    assert planned[0]['start'] == utils.ms_to_datetime(2800000).isoformat()
+    assert planned[0]['charge_in_kwh'] == -1.0
+    assert len(planned) == 1
+    assert completed == []
+
+    planned, completed = index.dispatches(3000000)
+    assert len(planned) == 1
+    assert len(completed) == 1
+
+
+async def test_phase_timer():
+    """Each phase is recorded, including ones that raise."""
+    timer = utils.PhaseTimer()
+
+    with timer.phase("login"):
+        pass
+
+    try:
+        with timer.phase("refresh"):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert list(timer.timings) == ["login", "refresh"]
+    assert timer.total == round(sum(timer.timings.values()), 1)
+    assert str(timer).startswith("login=")
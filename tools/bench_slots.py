@@ -0,0 +1,78 @@
+"""Benchmark slot lookups against long multi-day slot lists.
+
+Compares the previous linear scans in next_slot/in_slot with the bisect based
+SlotIndex. Run from the repository root with:
+
+    python -m tools.bench_slots
+"""
+from datetime import datetime
+from timeit import timeit
+from time import time
+
+from custom_components.ohme.utils import slot_list, SlotIndex, now_ms
+
+
+def _payload(days):
+    """Half hour slots, two hours on and one hour off, with now near the end.
+       This is the worst case for the linear scans, which have to walk past
+       every slot that has already finished."""
+    start = (int(time()) // 1800) * 1800 - (days * 48 - 4) * 1800
+    slots = []
+    wh = 0
+    for i in range(days * 48):
+        if i % 6 < 4:
+            wh += 3500
+            slots.append({
+                "startTimeMs": (start + i * 1800) * 1000,
+                "endTimeMs": (start + (i + 1) * 1800) * 1000,
+                "estimatedSoc": {"wh": wh}
+            })
+
+    return {"batterySocBefore": {"wh": 0}, "allSessionSlots": slots}
+
+
+def _linear_next_slot(slots, collapse_slots=True):
+    """Original next_slot implementation."""
+    start = None
+    end = None
+    for slot in slots:
+        if end is None and slot['end'] > datetime.now().astimezone():
+            end = slot['end']
+
+        if start is None and slot['start'] > datetime.now().astimezone():
+            start = slot['start']
+        elif collapse_slots and slot['start'] == end:
+            end = slot['end']
+        elif start is not None and end is not None:
+            break
+
+    return start, end
+
+
+def _linear_in_slot(slots):
+    """Original in_slot implementation."""
+    for slot in slots:
+        if slot['start'] < datetime.now().astimezone() and slot['end'] > datetime.now().astimezone():
+            return True
+    return False
+
+
+def main(number=2000):
+    for days in (1, 7, 30):
+        data = _payload(days)
+        slots = slot_list(data)
+        index = SlotIndex.from_session(data)
+
+        now = now_ms()
+
+        linear = timeit(lambda: (_linear_next_slot(slots), _linear_in_slot(slots)), number=number)
+        bisected = timeit(lambda: (index.next_start(now, True), index.next_end(now, True), index.current(now)), number=number)
+        build = timeit(lambda: SlotIndex.from_session(data), number=number // 10)
+
+        print(f"{len(slots):5d} slots: linear {linear / number * 1e6:9.1f}us  "
+              f"index {bisected / number * 1e6:6.2f}us  "
+              f"(decode once {build / (number // 10) * 1e6:7.1f}us)")
+
+
+if __name__ == "__main__":
+    main()
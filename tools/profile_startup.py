@@ -0,0 +1,85 @@
+"""Report the import cost of each integration module against the cold start budget.
+
+Imports the platforms in a fresh interpreter with -X importtime, after Home
+Assistant itself has been imported so only our own modules are counted.
+Run from the repository root with:
+
+    python -m tools.profile_startup
+
+Setup phase timings (login, device_info, each coordinator's first refresh and
+platforms) are logged by async_setup_entry at debug level, or as a warning when
+they exceed SETUP_BUDGET_MS. Enable them with:
+
+    logger:
+      logs:
+        custom_components.ohme: debug
+"""
+import subprocess
+import sys
+
+from custom_components.ohme.const import ENTITY_TYPES, IMPORT_BUDGET_MS
+
+PACKAGE = "custom_components.ohme"
+
+# Home Assistant modules we depend on, imported first so they aren't attributed to us
+PRELOAD = [
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.update_coordinator",
+    "homeassistant.helpers.entity_platform",
+    "aiohttp",
+]
+
+
+def _importtime():
+    """Import everything in a clean interpreter and return {module: (self us, cumulative us)}."""
+    code = "; ".join(
+        [f"import {module}" for module in PRELOAD]
+        + ["import sys; sys.stderr.write('-- start --\\n')"]
+        + [f"import {PACKAGE}.{platform}" for platform in ENTITY_TYPES]
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True
+    )
+
+    times = {}
+    started = False
+    for line in result.stderr.splitlines():
+        if line == "-- start --":
+            started = True
+            continue
+        if not started or not line.startswith("import time:"):
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Skip the header row
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return times
+
+
+def main():
+    times = _importtime()
+
+    print(f"{'module':<45} {'self ms':>9} {'cumulative ms':>14}")
+    own = 0
+    other = 0
+    for name, (self_us, cumulative_us) in times.items():
+        if not name.startswith(PACKAGE):
+            other += self_us
+            continue
+        own += self_us
+        print(f"{name:<45} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+    # Home Assistant platform components are shared with every other integration using them
+    own_ms = own / 1000
+    status = "OK" if own_ms <= IMPORT_BUDGET_MS else "OVER BUDGET"
+    print(f"\nIntegration modules {own_ms:.1f}ms against a {IMPORT_BUDGET_MS}ms budget: {status}")
+    print(f"Home Assistant modules pulled in by platforms {other / 1000:.1f}ms")
+    return 0 if own_ms <= IMPORT_BUDGET_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Replay recorded charge session traces through the charging detector.
+
+Traces are JSON lines, one sample per poll:
+
+    {"ts": 1700000000, "power": 7000, "wh": 12000, "in_slot": true, "charging": true}
+
+power and wh are null when there is no reading (eg. car disconnected) and
+charging is the ground truth. Each threshold option accepts several values and
+every combination is scored, so the detector can be tuned. Run from the
+repository root with:
+
+    python -m tools.replay_charging trace.jsonl [trace.jsonl ...] --off-readings 2 3 4
+"""
+import argparse
+import itertools
+import json
+
+from custom_components.ohme.detector import ChargingDetector
+from custom_components.ohme import const
+
+PARAMS = {
+    "window": const.DETECTOR_WINDOW,
+    "min_interval": const.DETECTOR_MIN_INTERVAL,
+    "boundary_drop": const.DETECTOR_BOUNDARY_DROP,
+    "off_readings": const.DETECTOR_OFF_READINGS,
+    "wh_window": const.DETECTOR_WH_WINDOW,
+    "min_wh_delta": const.DETECTOR_MIN_WH_DELTA,
+    "min_power": const.DETECTOR_MIN_POWER,
+}
+
+
+def load_trace(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score(trace, **params):
+    """Run a trace through a fresh detector.
+       Returns a dict of detection latencies (seconds) for each ground truth
+       transition, transitions that disagreed with the truth, and accuracy."""
+    detector = ChargingDetector(**params)
+    latencies = []
+    false_transitions = 0
+    matched = 0
+    missed = 0
+
+    truth = None
+    truth_since = None
+    pending = False
+    state = None
+
+    for sample in trace:
+        new_state = detector.update(sample["ts"], sample.get("power"), sample.get("wh"), sample.get("in_slot", False))
+        actual = sample.get("charging", new_state)
+
+        if truth is not None and actual != truth:
+            if pending:
+                missed += 1
+            truth_since = sample["ts"]
+            pending = True
+        truth = actual
+
+        if state is not None and new_state != state and new_state != actual:
+            false_transitions += 1
+        state = new_state
+
+        if pending and new_state == actual:
+            latencies.append(sample["ts"] - truth_since)
+            pending = False
+
+        matched += new_state == actual
+
+    return {
+        "latencies": latencies,
+        "missed": missed + pending,
+        "false_transitions": false_transitions,
+        "accuracy": matched / len(trace) if trace else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+")
+    for name, default in PARAMS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", nargs="+", type=type(default), default=[default])
+    args = parser.parse_args()
+
+    traces = [load_trace(path) for path in args.traces]
+
+    print(f"{'params':60s} {'mean lat':>9s} {'max lat':>8s} {'missed':>7s} {'false':>6s} {'accuracy':>9s}")
+    for values in itertools.product(*(getattr(args, name) for name in PARAMS)):
+        params = dict(zip(PARAMS, values))
+        results = [score(trace, **params) for trace in traces]
+
+        latencies = [x for result in results for x in result["latencies"]]
+        accuracy = [result["accuracy"] for result in results if result["accuracy"] is not None]
+
+        changed = ", ".join(f"{k}={v}" for k, v in params.items() if v != PARAMS[k]) or "defaults"
+        print(f"{changed:60s} "
+              f"{sum(latencies) / len(latencies) if latencies else 0:8.1f}s "
+              f"{max(latencies, default=0):7.1f}s "
+              f"{sum(result['missed'] for result in results):7d} "
+              f"{sum(result['false_transitions'] for result in results):6d} "
+              f"{sum(accuracy) / len(accuracy) if accuracy else 0:9.3f}")
+
+
+if __name__ == "__main__":
+    main()